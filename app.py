@@ -1,7 +1,13 @@
 from __future__ import annotations
 
-import logging
 import os
+
+if os.environ.get("ASYNC_MODE") == "gevent":
+    # Must run before threading, socket and requests are imported.
+    from gevent import monkey
+    monkey.patch_all()
+
+import logging
 import threading
 import time
 import webbrowser
@@ -10,7 +16,7 @@ from typing import Optional
 
 import requests
 
-from server import create_app, socketio
+from server import ASYNC_MODE, create_app, socketio
 
 LAUNCH_MODE = os.environ.get("LAUNCH_MODE", "main")
 BASE_URL = "http://localhost:6767"
@@ -176,24 +182,32 @@ class LauncherApp:
             self.render_state(self.latest_state)
 
 
-def start_server() -> threading.Thread:
+def run_server() -> None:
     flask_app = create_app()
-    server_thread = threading.Thread(
-        target=lambda: socketio.run(
-            flask_app,
-            host="0.0.0.0",
-            port=6767,
-            use_reloader=False,
-            debug=LAUNCH_MODE == "debug",
-            allow_unsafe_werkzeug=True,
-        ),
-        daemon=True,
+    socketio.run(
+        flask_app,
+        host="0.0.0.0",
+        port=6767,
+        use_reloader=False,
+        debug=LAUNCH_MODE == "debug",
+        allow_unsafe_werkzeug=True,
     )
+
+
+def start_server() -> threading.Thread:
+    server_thread = threading.Thread(target=run_server, daemon=True)
     server_thread.start()
     return server_thread
 
 
 def main() -> None:
+    if ASYNC_MODE != "threading":
+        # The Tk main loop would block the event loop the server runs on, so
+        # event-loop modes serve headless; use the browser views directly.
+        print(f"Serving {ASYNC_MODE} mode at {BASE_URL} (main display: {MAIN_URL})")
+        run_server()
+        return
+
     start_server()
     root = tk.Tk()
     LauncherApp(root)
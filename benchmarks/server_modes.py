@@ -0,0 +1,179 @@
+"""
+Side-by-side benchmark of the server's async modes.
+
+Starts the server once per mode in a subprocess, connects a crowd of idle
+Socket.IO clients to one room, then measures what the server pays for them
+(OS threads, resident memory) and how long a state broadcast takes to reach
+every client.
+
+Setup required (once):
+    pip install python-socketio[client] websocket-client gevent gevent-websocket
+
+Run with:
+    python benchmarks/server_modes.py --clients 200 --broadcasts 20
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MODES = ("threading", "gevent")
+
+
+def serve(mode: str, port: int) -> None:
+    if mode == "gevent":
+        from gevent import monkey
+        monkey.patch_all()
+    os.environ["ASYNC_MODE"] = mode
+    sys.path.insert(0, str(ROOT))
+    from server import create_app, socketio
+
+    app = create_app()
+    socketio.run(app, host="127.0.0.1", port=port, use_reloader=False, log_output=False,
+                 allow_unsafe_werkzeug=True)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _proc_status(pid: int) -> dict[str, int]:
+    fields = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("Threads", "VmRSS"):
+                fields[key] = int(value.split()[0])
+    return fields
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_mode(mode: str, n_clients: int, n_broadcasts: int) -> dict:
+    import requests
+    import socketio as sio_client_lib
+
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    proc = subprocess.Popen(
+        [sys.executable, __file__, "--serve", mode, "--port", str(port)],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    clients = []
+    try:
+        deadline = time.time() + 15
+        while time.time() < deadline:
+            try:
+                requests.get(f"{base}/api/game/state", timeout=0.5)
+                break
+            except requests.RequestException:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError(f"{mode} server did not start")
+
+        room_code = requests.post(f"{base}/api/rooms", timeout=5).json()["room_code"]
+        baseline = _proc_status(proc.pid)
+
+        received = [0] * n_clients
+        lock = threading.Lock()
+        cond = threading.Condition(lock)
+
+        def _make_handler(i: int):
+            def _on_patch(_data):
+                with cond:
+                    received[i] += 1
+                    cond.notify_all()
+            return _on_patch
+
+        connect_start = time.perf_counter()
+        for i in range(n_clients):
+            client = sio_client_lib.Client(reconnection=False)
+            client.on("state_patch", _make_handler(i))
+            client.on("game_state", lambda _data: None)
+            client.connect(f"{base}?room={room_code}&role=main", transports=["websocket"])
+            clients.append(client)
+        connect_s = time.perf_counter() - connect_start
+        time.sleep(0.5)
+        loaded = _proc_status(proc.pid)
+
+        latencies = []
+        timeouts = 0
+        for b in range(n_broadcasts):
+            target = b + 1
+            start = time.perf_counter()
+            requests.post(f"{base}/api/rooms/{room_code}/players", json={"name": f"Bench {b}"}, timeout=5)
+            with cond:
+                delivered = cond.wait_for(lambda: min(received) >= target, timeout=10)
+            # A broadcast that never reached every client has no latency;
+            # count it instead of recording the timeout as a sample.
+            if delivered:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                timeouts += 1
+
+        return {
+            "mode": mode,
+            "clients": n_clients,
+            "connect_s": round(connect_s, 3),
+            "threads_idle": baseline["Threads"],
+            "threads_connected": loaded["Threads"],
+            "rss_idle_kb": baseline["VmRSS"],
+            "rss_connected_kb": loaded["VmRSS"],
+            "fanout_p50_ms": round(statistics.median(latencies), 2) if latencies else None,
+            "fanout_p99_ms": round(_percentile(latencies, 99), 2) if latencies else None,
+            "fanout_timeouts": timeouts,
+        }
+    finally:
+        # Stop the server first: disconnecting a large crowd one handshake at a
+        # time takes far longer than letting every socket drop at once.
+        proc.terminate()
+        proc.wait(timeout=10)
+        for client in clients:
+            try:
+                client.disconnect()
+            except Exception:
+                pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--broadcasts", type=int, default=20)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--output", type=Path, help="also write results as JSON to this file")
+    parser.add_argument("--serve", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    results = [run_mode(mode, args.clients, args.broadcasts) for mode in args.modes]
+    columns = list(results[0])
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in results:
+        print("  ".join(str(r[c]).ljust(widths[c]) for c in columns))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Speed and accuracy benchmark for the lie similarity check.
+
+Builds labelled lie/truth pairs from data/seed.json. Pairs that must be
+rejected come from the real answers and their case, article, number-word,
+typo, paraphrase and partial-name variants. Pairs that must be accepted come
+from the stored lies and other answers in the same category. The benchmark
+times every tier of the check (normalize, heuristic, fuzzy, embedding),
+reports precision and recall of is_too_similar, and sweeps the similarity
+threshold so SIMILARITY_THRESHOLD can be tuned against the same corpus.
+
+Results are written to benchmarks/results/similarity-<commit>.json; pass an
+earlier file to --compare to see what changed.
+
+Run with:
+    python benchmarks/similarity.py
+    python benchmarks/similarity.py --backend lmstudio --compare benchmarks/results/similarity-abc1234.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+THRESHOLDS = (0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95)
+
+sys.path.insert(0, str(ROOT))
+
+from server import embeddings  # noqa: E402
+from server.embedding_backends import HashedNgramBackend, LMStudioBackend  # noqa: E402
+from server.embedding_cache import EmbeddingCache  # noqa: E402
+from server.similarity import cosine  # noqa: E402
+
+_ONES = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+         "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen"]
+_TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+_PARAPHRASES = ("It's {}", "I think {}", "{} of course", "Definitely {}")
+
+
+class Case(NamedTuple):
+    lie: str
+    truth: str
+    too_similar: bool
+    kind: str
+
+
+def _spell_under_100(n: int) -> str:
+    if n < 20:
+        return _ONES[n]
+    tens, ones = divmod(n, 10)
+    return _TENS[tens] + (f"-{_ONES[ones]}" if ones else "")
+
+
+def spell_number(n: int) -> list[str]:
+    """English spellings of ``n`` that the normalizer maps back to digits."""
+    if n < 100:
+        return [_spell_under_100(n)]
+    spellings = []
+    thousands, rest = divmod(n, 1000)
+    hundreds, tail = divmod(rest, 100)
+    words = []
+    if thousands:
+        words += [_spell_under_100(thousands), "thousand"]
+    if hundreds:
+        words += [_ONES[hundreds], "hundred"]
+    if tail:
+        words += (["and"] if words else []) + [_spell_under_100(tail)]
+    spellings.append(" ".join(words))
+    if 1100 <= n <= 2099 and n % 100 >= 20:  # years: "nineteen forty-five"
+        spellings.append(f"{_spell_under_100(n // 100)} {_spell_under_100(n % 100)}")
+    return spellings
+
+
+def _typo(word: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1:] if rng.random() < 0.5 else word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def build_corpus(seed_path: Path, rng_seed: int = 0) -> list[Case]:
+    rng = random.Random(rng_seed)
+    questions = json.loads(seed_path.read_text())
+    by_category: dict[str, list[str]] = {}
+    for q in questions:
+        by_category.setdefault(q["category"], []).append(q["answer"])
+
+    cases: list[Case] = []
+    for q in questions:
+        truth = q["answer"]
+
+        def reject(lie: str, kind: str) -> None:
+            cases.append(Case(lie, truth, True, kind))
+
+        reject(truth, "exact")
+        reject(truth.upper(), "case")
+        reject(f"{truth}!", "punctuation")
+        if truth.lower().startswith("the "):
+            reject(truth[4:], "article")
+        else:
+            reject(f"The {truth}", "article")
+        if truth.isdigit():
+            for spelling in spell_number(int(truth)):
+                reject(spelling, "number-words")
+        words = truth.split()
+        long_words = [w for w in words if len(w) >= 5 and w.isalpha()]
+        if long_words:
+            word = rng.choice(long_words)
+            reject(truth.replace(word, _typo(word, rng), 1), "typo")
+        reject(rng.choice(_PARAPHRASES).format(truth), "paraphrase")
+        if len(words) > 1:
+            reject(max(words, key=len), "partial-name")
+
+        for lie in q.get("lies", []):
+            cases.append(Case(lie, truth, False, "stored-lie"))
+        others = [a for a in by_category[q["category"]] if a != truth]
+        for other in rng.sample(others, min(3, len(others))):
+            cases.append(Case(other, truth, False, "other-answer"))
+    return cases
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def time_tier(name: str, calls: list[Callable[[], object]], repeat: int) -> dict:
+    samples = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for call in calls:
+            t0 = time.perf_counter_ns()
+            call()
+            samples.append((time.perf_counter_ns() - t0) / 1000)
+    elapsed = time.perf_counter() - start
+    return {
+        "tier": name,
+        "calls": len(samples),
+        "ops_per_s": round(len(samples) / elapsed),
+        "p50_us": round(_percentile(samples, 50), 2),
+        "p99_us": round(_percentile(samples, 99), 2),
+    }
+
+
+def _scores(predicted: list[bool], cases: list[Case]) -> dict:
+    tp = sum(p and c.too_similar for p, c in zip(predicted, cases))
+    fp = sum(p and not c.too_similar for p, c in zip(predicted, cases))
+    fn = sum(not p and c.too_similar for p, c in zip(predicted, cases))
+    return {
+        "precision": round(tp / (tp + fp), 4) if tp + fp else 1.0,
+        "recall": round(tp / (tp + fn), 4) if tp + fn else 1.0,
+        "false_positives": fp,
+        "false_negatives": fn,
+    }
+
+
+def run(backend_name: str, repeat: int) -> dict:
+    backend = HashedNgramBackend() if backend_name == "local" else LMStudioBackend(
+        embeddings.LM_STUDIO_URL, embeddings.EMBEDDING_MODEL, 10.0)
+    cases = build_corpus(ROOT / "data" / "seed.json")
+    pairs = [(embeddings._normalize_text(c.lie), embeddings.prepare_text(c.truth)) for c in cases]
+
+    tiers = [
+        time_tier("normalize", [lambda c=c: embeddings.normalize_answer_text(c.lie) for c in cases], repeat),
+        time_tier("heuristic", [
+            lambda lie=lie, truth=truth: embeddings._token_subset_match(embeddings._word_tokens(lie), list(truth.tokens))
+            for lie, truth in pairs
+        ], repeat),
+        time_tier("fuzzy", [
+            lambda lie=lie, truth=truth: embeddings._fuzzy_token_subset_match(embeddings._word_tokens(lie), list(truth.tokens))
+            for lie, truth in pairs
+        ], repeat),
+    ]
+
+    # Embeddings are timed uncached, straight from the backend; the accuracy
+    # run below goes through a throwaway cache so data/embeddings.db is
+    # left alone.
+    similarities = []
+    embed_samples = []
+    for lie, truth in pairs:
+        t0 = time.perf_counter_ns()
+        vec_lie, vec_truth = backend.embed([lie, truth.normalized])
+        similarities.append(cosine(vec_lie, vec_truth))
+        embed_samples.append((time.perf_counter_ns() - t0) / 1000)
+    tiers.append({
+        "tier": f"embedding ({backend.model})",
+        "calls": len(embed_samples),
+        "ops_per_s": round(len(embed_samples) / (sum(embed_samples) / 1e6)),
+        "p50_us": round(_percentile(embed_samples, 50), 2),
+        "p99_us": round(_percentile(embed_samples, 99), 2),
+    })
+
+    with tempfile.TemporaryDirectory() as tmp:
+        saved_cache, saved_backend = embeddings._cache, embeddings.get_embedding_backend()
+        embeddings._cache = EmbeddingCache(Path(tmp) / "embeddings.db")
+        embeddings.set_embedding_backend(backend)
+        try:
+            tiers.append(time_tier("is_too_similar", [
+                lambda c=c, truth=truth: embeddings.is_too_similar(c.lie, c.truth, truth)
+                for c, (_, truth) in zip(cases, pairs)
+            ], 1))
+            verdicts = [embeddings.is_too_similar(c.lie, c.truth, truth) for c, (_, truth) in zip(cases, pairs)]
+        finally:
+            embeddings._cache.close()
+            embeddings._cache = saved_cache
+            embeddings.set_embedding_backend(saved_backend)
+
+    heuristic = [
+        embeddings._heuristic_too_similar(lie, truth.normalized, truth.tokens) is not None
+        for lie, truth in pairs
+    ]
+    sweep = [
+        {"threshold": t, **_scores([h or s >= t for h, s in zip(heuristic, similarities)], cases)}
+        for t in THRESHOLDS
+    ]
+    kinds = sorted({c.kind for c in cases})
+    by_kind = {
+        kind: round(sum(v == c.too_similar for v, c in zip(verdicts, cases) if c.kind == kind)
+                    / sum(c.kind == kind for c in cases), 4)
+        for kind in kinds
+    }
+    return {
+        "commit": _commit(),
+        "backend": backend.model,
+        "threshold": embeddings.SIMILARITY_THRESHOLD,
+        "cases": len(cases),
+        "tiers": tiers,
+        "accuracy": _scores(verdicts, cases),
+        "accuracy_by_kind": by_kind,
+        "threshold_sweep": sweep,
+    }
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _print_table(rows: list[dict]) -> None:
+    columns = list(rows[0])
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(str(r[c]).ljust(widths[c]) for c in columns))
+    print()
+
+
+def _print_comparison(old: dict, new: dict) -> None:
+    print(f"Compared with {old['commit']}:")
+    old_tiers = {t["tier"]: t for t in old["tiers"]}
+    rows = [
+        {"tier": t["tier"], "p50_us": f"{old_tiers[t['tier']]['p50_us']} -> {t['p50_us']}",
+         "ops_per_s": f"{old_tiers[t['tier']]['ops_per_s']} -> {t['ops_per_s']}"}
+        for t in new["tiers"] if t["tier"] in old_tiers
+    ]
+    if rows:
+        _print_table(rows)
+    _print_table([
+        {"metric": m, "before": old["accuracy"][m], "after": new["accuracy"][m]}
+        for m in new["accuracy"]
+    ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=("local", "lmstudio"), default="local")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the corpus for the fast tiers")
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/similarity-<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = run(args.backend, args.repeat)
+    print(f"{results['cases']} cases, backend {results['backend']}, threshold {results['threshold']}\n")
+    _print_table(results["tiers"])
+    _print_table([{"kind": k, "correct": v} for k, v in results["accuracy_by_kind"].items()])
+    _print_table(results["threshold_sweep"])
+
+    if args.compare:
+        _print_comparison(json.loads(args.compare.read_text()), results)
+
+    output = args.output or RESULTS_DIR / f"similarity-{results['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Saved {output.relative_to(ROOT) if output.is_relative_to(ROOT) else output}")
+
+
+if __name__ == "__main__":
+    main()
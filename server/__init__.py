@@ -1,9 +1,16 @@
-import threading
+import os
+from pathlib import Path
+
 from flask import Flask
 from flask_socketio import SocketIO
 
-socketio = SocketIO(cors_allowed_origins="*", async_mode="threading")
-game_state_lock = threading.Lock()
+# "threading" (default) runs one OS thread per connection under Werkzeug.
+# "gevent" serves every connection, handler and phase timer as a greenlet on
+# one event loop; the process must call gevent.monkey.patch_all() before
+# importing anything else (app.py does this when ASYNC_MODE=gevent).
+ASYNC_MODE = os.environ.get("ASYNC_MODE", "threading")
+
+socketio = SocketIO(cors_allowed_origins="*", async_mode=ASYNC_MODE)
 
 _initialized = False
 
@@ -18,21 +25,25 @@ def create_app():
 
         from .events import register_events
         register_events(socketio)
-
-        from .timers import start_tick_loop
-        start_tick_loop(socketio)
     else:
         # Second call (e.g. from test_game_flow's app fixture): bind the new
         # Flask app to the already-running SocketIO server without replacing it.
         app.extensions['socketio'] = socketio
 
-    from .routes import bp as routes_bp
+    from .routes import bp as routes_bp, rooms_bp
+    app.register_blueprint(rooms_bp)
     app.register_blueprint(routes_bp)
+    app.register_blueprint(routes_bp, url_prefix="/api/rooms/<room_code>", name="room_api")
 
     from .views import bp as views_bp
     app.register_blueprint(views_bp)
 
-    from .db import init_db
-    init_db()
+    from .questions import QUESTION_PACK, use_compiled_pack
+    if QUESTION_PACK:
+        use_compiled_pack(Path(QUESTION_PACK))
+    else:
+        from .db import init_db, start_answer_backfill
+        init_db()
+        start_answer_backfill()
 
     return app
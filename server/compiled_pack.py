@@ -0,0 +1,321 @@
+"""
+Compiled question packs.
+
+A read-only binary image of the question bank, opened with ``mmap`` so a
+server starts without touching SQLite and worker processes share its pages.
+Lookups are slices of the mapping: nothing is parsed up front beyond the
+header, and reading a question decodes only that question's strings.
+
+Layout (little-endian; offsets are absolute, lengths in bytes):
+
+    header      magic, version, flags, counts and section offsets
+    records     one fixed-size record per question, in id order
+    ids         the records' question ids as uint32, for binary search
+    lies        (offset, length) of each lie, grouped by question
+    symbols     (offset, length) of each category, group and model name
+    categories  (id, name symbol, first member, member count) per category
+    members     record numbers of each category's questions
+    strings     UTF-8 text and float32 embeddings, addressed relative to
+                the start of this section
+
+Build one with ``python -m server.compiled_pack <output>`` from
+data/questions.db, or with ``--from <pack>...`` from question pack files
+(see server.packs). Serve it by starting the server with
+``QUESTION_PACK=<output>``.
+"""
+from __future__ import annotations
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+MAGIC = b"LAQP"
+VERSION = 1
+FLAG_DB_IDS = 1  # question ids are questions.db row ids
+
+_HEADER = struct.Struct("<4sIIIIIIQQQQQQQ")
+_RECORD = struct.Struct("<16I")
+_PAIR = struct.Struct("<II")
+_CATEGORY = struct.Struct("<IIII")
+_NONE = 0xFFFFFFFF
+
+
+class PackFormatError(ValueError):
+    pass
+
+
+# ---------------------------------------------------------------------------
+# Compiler
+# ---------------------------------------------------------------------------
+
+class _StringTable:
+    """Appends strings and blobs to a spill file, handing back their offsets."""
+
+    def __init__(self, spill: BinaryIO):
+        self.spill = spill
+        self.size = 0
+
+    def add(self, data: bytes, align: int = 1) -> tuple[int, int]:
+        padding = -self.size % align
+        if padding:
+            self.spill.write(b"\0" * padding)
+            self.size += padding
+        offset = self.size
+        self.spill.write(data)
+        self.size += len(data)
+        if self.size > _NONE:
+            raise PackFormatError("Question bank too large for one pack")
+        return offset, len(data)
+
+    def text(self, value: Optional[str]) -> tuple[int, int]:
+        return self.add((value or "").encode("utf-8"))
+
+
+def compile_pack(questions: Iterable[dict], path: Path, ids_from_db: bool = False) -> int:
+    """Write ``questions`` (as yielded by ``db.iter_questions``) to ``path``.
+
+    Questions must arrive in ascending id order. The pack is written beside
+    ``path`` and moved into place, so a server never maps a partial file.
+    Returns the number of questions written.
+    """
+    records = bytearray()
+    ids = array("I")
+    lies = bytearray()
+    symbols: list[tuple[int, int]] = []
+    symbol_index: dict[str, int] = {}
+    categories: dict[int, tuple[int, int, array]] = {}  # category id -> (index, name symbol, record numbers)
+
+    with tempfile.TemporaryFile(dir=path.parent) as spill:
+        strings = _StringTable(spill)
+
+        def symbol(name: Optional[str]) -> int:
+            if name is None:
+                return _NONE
+            if name not in symbol_index:
+                symbol_index[name] = len(symbols)
+                symbols.append(strings.text(name))
+            return symbol_index[name]
+
+        for q in questions:
+            if ids and q["id"] <= ids[-1]:
+                raise PackFormatError("Questions must be compiled in ascending id order")
+            category = categories.get(q["category_id"])
+            if category is None:
+                category = categories[q["category_id"]] = (len(categories), symbol(q["category_name"]), array("I"))
+            category[2].append(len(ids))
+
+            embedding = q.get("answer_embedding")
+            if embedding is not None and not isinstance(embedding, (bytes, memoryview)):
+                embedding = array("f", embedding).tobytes()
+            lies_first = len(lies) // _PAIR.size
+            for lie in q["lies"]:
+                lies += _PAIR.pack(*strings.text(lie))
+            records += _RECORD.pack(
+                q["id"],
+                category[0],
+                symbol(q.get("group_name")),
+                *strings.text(q["prompt"]),
+                *strings.text(q["answer"]),
+                *strings.text(q.get("answer_normalized")),
+                *strings.text(q.get("answer_tokens")),
+                *(strings.add(embedding, align=4) if embedding else (0, 0)),
+                symbol(q.get("answer_embedding_model")),
+                lies_first,
+                len(q["lies"]),
+            )
+            ids.append(q["id"])
+
+        members = array("I")
+        category_rows = bytearray()
+        for category_id, (_, name, numbers) in categories.items():
+            category_rows += _CATEGORY.pack(category_id, name, len(members), len(numbers))
+            members.extend(numbers)
+
+        sections = [
+            bytes(records),
+            _little_endian(ids),
+            bytes(lies),
+            b"".join(_PAIR.pack(*pair) for pair in symbols),
+            bytes(category_rows),
+            _little_endian(members),
+        ]
+        offsets = []
+        position = _HEADER.size
+        for section in sections:
+            offsets.append(position)
+            position += len(section)
+        position += -position % 4  # keep float32 embeddings aligned in the map
+        offsets.append(position)
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as out:
+            out.write(_HEADER.pack(
+                MAGIC, VERSION, FLAG_DB_IDS if ids_from_db else 0,
+                len(ids), len(lies) // _PAIR.size, len(symbols), len(categories), *offsets,
+            ))
+            for section in sections:
+                out.write(section)
+            out.write(b"\0" * (offsets[-1] - out.tell()))
+            spill.seek(0)
+            while chunk := spill.read(1 << 20):
+                out.write(chunk)
+        os.replace(tmp_path, path)
+    return len(ids)
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+# ---------------------------------------------------------------------------
+# Reader
+# ---------------------------------------------------------------------------
+
+class CompiledPack:
+    """An open pack. Its arrays are read in place, so the host must be little-endian."""
+
+    def __init__(self, path: Path):
+        if sys.byteorder != "little":
+            raise PackFormatError("Compiled packs can only be read on little-endian hosts")
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise PackFormatError(f"{path.name} is not a compiled question pack")
+        if len(self._map) < _HEADER.size or self._map[:4] != MAGIC:
+            self.close()
+            raise PackFormatError(f"{path.name} is not a compiled question pack")
+        (_, version, flags, self.question_count, _lie_count, symbol_count, category_count,
+         self._records, ids, self._lies, symbols, categories, members, strings) = _HEADER.unpack_from(self._map)
+        if version != VERSION:
+            self.close()
+            raise PackFormatError(f"{path.name} has pack version {version}, expected {VERSION}")
+        self.ids_from_db = bool(flags & FLAG_DB_IDS)
+
+        self._view = memoryview(self._map)
+        self._strings = self._view[strings:]
+        self._ids = self._view[ids:ids + 4 * self.question_count].cast("I")
+        self._members = self._view[members:members + 4 * self.question_count].cast("I")
+        self._symbols = [self._text(*_PAIR.unpack_from(self._map, symbols + i * _PAIR.size)) for i in range(symbol_count)]
+        self._categories = [_CATEGORY.unpack_from(self._map, categories + i * _CATEGORY.size) for i in range(category_count)]
+
+    def _text(self, offset: int, length: int) -> str:
+        return str(self._strings[offset:offset + length], "utf-8")
+
+    def _symbol(self, index: int) -> Optional[str]:
+        return None if index == _NONE else self._symbols[index]
+
+    def catalog(self) -> list[tuple[int, int, Optional[str]]]:
+        """Every question as (id, category_id, group_name), like db.get_question_catalog."""
+        rows = []
+        for category_id, _, first, count in self._categories:
+            for number in self._members[first:first + count]:
+                rows.append((self._ids[number], category_id, self._symbol(
+                    _RECORD.unpack_from(self._map, self._records + number * _RECORD.size)[2]
+                )))
+        rows.sort()
+        return rows
+
+    def category_names(self) -> list[tuple[int, str]]:
+        return sorted(((cid, self._symbols[name]) for cid, name, _, _ in self._categories), key=lambda c: c[1])
+
+    def question(self, question_id: int) -> Optional[dict]:
+        """The question in db.get_question's shape, lies in random order."""
+        number = bisect_left(self._ids, question_id)
+        if number == self.question_count or self._ids[number] != question_id:
+            return None
+        (qid, category, group, prompt_off, prompt_len, answer_off, answer_len, norm_off, norm_len,
+         tokens_off, tokens_len, emb_off, emb_len, model, lies_first, lies_count) = _RECORD.unpack_from(
+            self._map, self._records + number * _RECORD.size
+        )
+        category_id, category_name, _, _ = self._categories[category]
+        embedding = None
+        if emb_len:
+            embedding = array("f", self._strings[emb_off:emb_off + emb_len].cast("f"))
+        lies = [
+            self._text(*_PAIR.unpack_from(self._map, self._lies + i * _PAIR.size))
+            for i in range(lies_first, lies_first + lies_count)
+        ]
+        random.shuffle(lies)
+        return {
+            "id": qid,
+            "category_id": category_id,
+            "category_name": self._symbols[category_name],
+            "prompt": self._text(prompt_off, prompt_len),
+            "answer": self._text(answer_off, answer_len),
+            "group_name": self._symbol(group),
+            "last_used_at": None,
+            "answer_normalized": self._text(norm_off, norm_len) or None,
+            "answer_tokens": self._text(tokens_off, tokens_len) or None,
+            "answer_embedding": embedding,
+            "answer_embedding_model": self._symbol(model),
+            "lies": lies,
+        }
+
+    def close(self) -> None:
+        for name in ("_ids", "_members", "_strings", "_view"):
+            view = self.__dict__.pop(name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        self._map.close()
+        self._file.close()
+
+
+# ---------------------------------------------------------------------------
+# Command line
+# ---------------------------------------------------------------------------
+
+def _questions_from_packs(paths: list[Path]) -> Iterator[dict]:
+    from server.embeddings import prepare_text
+    from server.packs import read_pack
+
+    category_ids: dict[str, int] = {}
+    question_id = 0
+    for path in paths:
+        for entry in read_pack(path):
+            question_id += 1
+            prepared = prepare_text(entry["answer"])
+            yield {
+                "id": question_id,
+                "category_id": category_ids.setdefault(entry["category"], len(category_ids) + 1),
+                "category_name": entry["category"],
+                "prompt": entry["question"],
+                "answer": entry["answer"],
+                "group_name": entry["group"],
+                "answer_normalized": prepared.normalized,
+                "answer_tokens": " ".join(prepared.tokens),
+                "lies": entry["lies"],
+            }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compile the question bank into a memory-mappable pack.")
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--from", dest="sources", nargs="+", type=Path,
+                        help="question pack files to compile instead of data/questions.db")
+    args = parser.parse_args()
+
+    if args.sources:
+        count = compile_pack(_questions_from_packs(args.sources), args.output)
+    else:
+        from server.db import init_db, iter_questions
+        init_db()
+        count = compile_pack(iter_questions(), args.output, ids_from_db=True)
+    print(f"Wrote {count} questions to {args.output} ({args.output.stat().st_size:,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
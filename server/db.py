@@ -1,25 +1,83 @@
 from __future__ import annotations
-import json
-import os
-import random
+import atexit
+import hashlib
+import logging
+import queue
+import re
 import sqlite3
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from itertools import groupby, islice
 from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from server.embeddings import embed_texts, get_embedding_backend, prepare_text
+from server.packs import read_pack
+
+LOGGER = logging.getLogger(__name__)
 
 DB_PATH = Path(__file__).parent.parent / "data" / "questions.db"
 SEED_PATH = Path(__file__).parent.parent / "data" / "seed.json"
 
+# Connections are opened lazily and kept for the life of the process; sqlite3
+# caches prepared statements per connection, so keeping every query's SQL text
+# constant lets repeat calls skip parsing entirely.
+POOL_SIZE = 4
+STATEMENT_CACHE_SIZE = 256
+_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",    # safe with WAL; fsync only at checkpoints
+    "PRAGMA cache_size=-8192",      # 8 MiB page cache per connection
+    "PRAGMA mmap_size=67108864",    # read pages straight from a 64 MiB mapping
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+_pool: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue(maxsize=POOL_SIZE)
+_catalog_version = 0
+
 
 def _connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
     conn.row_factory = sqlite3.Row
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
     return conn
 
 
+@contextmanager
+def _connection() -> Iterator[sqlite3.Connection]:
+    """Borrow a pooled connection, opening one if the pool is empty."""
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = _connect()
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            _pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+def close_connections() -> None:
+    while True:
+        try:
+            _pool.get_nowait().close()
+        except queue.Empty:
+            return
+
+
 def init_db() -> None:
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = _connect()
-    try:
+    with _connection() as conn:
         conn.executescript("""
             PRAGMA journal_mode=WAL;
 
@@ -45,160 +103,596 @@ def init_db() -> None:
             );
         """)
         conn.commit()
+        _migrate(conn)
 
-        row = conn.execute("SELECT COUNT(*) FROM categories").fetchone()
-        if row[0] == 0 and SEED_PATH.exists():
-            _seed_from_json(conn)
-    finally:
-        conn.close()
-
+        seeded = conn.execute("SELECT COUNT(*) FROM categories").fetchone()[0] > 0
+    if not seeded and SEED_PATH.exists():
+        stats = import_questions(read_pack(SEED_PATH))
+        LOGGER.info("Seeded %d questions in %.2fs", stats.inserted, stats.seconds)
+    _bump_catalog_version()
 
-def _seed_from_json(conn: sqlite3.Connection) -> None:
-    with open(SEED_PATH, "r", encoding="utf-8") as f:
-        entries = json.load(f)
 
-    category_ids: dict[str, int] = {}
+# ---------------------------------------------------------------------------
+# Schema migrations
+# ---------------------------------------------------------------------------
 
-    for entry in entries:
-        cat_name = entry["category"]
-        if cat_name not in category_ids:
-            cur = conn.execute(
-                "INSERT OR IGNORE INTO categories (name) VALUES (?)", (cat_name,)
-            )
+# The tables above are the original schema; everything since is a migration.
+# PRAGMA user_version counts the migrations a database has run, and each
+# runs in its own transaction, so an interrupted upgrade resumes cleanly.
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    while conn.execute("PRAGMA user_version").fetchone()[0] < len(_MIGRATIONS):
+        # Take the write lock before reading the version again: when two
+        # processes start together, the second waits and then finds the
+        # migration already applied.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version == len(_MIGRATIONS):
+                conn.rollback()
+                return
+            migration = _MIGRATIONS[version]
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
             conn.commit()
-            row = conn.execute("SELECT id FROM categories WHERE name = ?", (cat_name,)).fetchone()
-            category_ids[cat_name] = row["id"]
+        except BaseException:
+            conn.rollback()
+            raise
+        LOGGER.info("Applied database migration %d (%s)", version + 1, migration.__name__)
+
+
+# Precomputed features of questions.answer.
+_ANSWER_FEATURE_COLUMNS = {
+    "answer_normalized": "TEXT DEFAULT NULL",
+    "answer_tokens": "TEXT DEFAULT NULL",
+    "answer_embedding": "BLOB DEFAULT NULL",
+    "answer_embedding_model": "TEXT DEFAULT NULL",
+}
+
+
+# Identifies a question across imports, so re-importing a pack updates rows
+# in place instead of duplicating them.
+_IMPORT_COLUMNS = {
+    "content_hash": "TEXT DEFAULT NULL",
+}
+
+
+def _add_answer_features_and_content_hash(conn: sqlite3.Connection) -> None:
+    # Databases from before migrations existed may have some of these already.
+    _add_missing_columns(conn, "questions", _ANSWER_FEATURE_COLUMNS)
+    _add_missing_columns(conn, "questions", _IMPORT_COLUMNS)
+    _backfill_content_hashes(conn)
+    conn.execute("CREATE INDEX IF NOT EXISTS questions_content_hash ON questions(content_hash)")
+
+
+def _add_question_indexes(conn: sqlite3.Connection) -> None:
+    # Covers the catalog read that builds server.questions' index, in the
+    # order the index is stored.
+    conn.execute("CREATE INDEX questions_catalog ON questions(category_id, group_name)")
+    # Covers looking up a question's lies, one question or a batch at a time.
+    conn.execute("DROP INDEX IF EXISTS question_lies_question")
+    conn.execute("CREATE INDEX question_lies_by_question ON question_lies(question_id, text)")
+
+
+def _add_question_search(conn: sqlite3.Connection) -> None:
+    # Full-text index over prompts and answers for search_questions. It reads
+    # its text from the questions table, and the triggers keep it in step.
+    conn.execute("""
+        CREATE VIRTUAL TABLE questions_fts USING fts5(
+            prompt, answer,
+            content='questions', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER questions_fts_insert AFTER INSERT ON questions BEGIN
+            INSERT INTO questions_fts (rowid, prompt, answer) VALUES (new.id, new.prompt, new.answer);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER questions_fts_delete AFTER DELETE ON questions BEGIN
+            INSERT INTO questions_fts (questions_fts, rowid, prompt, answer)
+            VALUES ('delete', old.id, old.prompt, old.answer);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER questions_fts_update AFTER UPDATE OF prompt, answer ON questions BEGIN
+            INSERT INTO questions_fts (questions_fts, rowid, prompt, answer)
+            VALUES ('delete', old.id, old.prompt, old.answer);
+            INSERT INTO questions_fts (rowid, prompt, answer) VALUES (new.id, new.prompt, new.answer);
+        END
+    """)
+    conn.execute("INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')")
+    # Pages through one category in id order (the index key ends in rowid).
+    conn.execute("CREATE INDEX questions_by_category ON questions(category_id)")
+
+
+_MIGRATIONS = (
+    _add_answer_features_and_content_hash,
+    _add_question_indexes,
+    _add_question_search,
+)
+
+
+def _add_missing_columns(conn: sqlite3.Connection, table: str, columns: dict[str, str]) -> None:
+    existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+def question_hash(category: str, prompt: str) -> str:
+    return hashlib.sha1(f"{category}\x1f{prompt}".encode("utf-8")).hexdigest()
+
+
+def _backfill_content_hashes(conn: sqlite3.Connection) -> None:
+    rows = conn.execute("""
+        SELECT q.id, c.name, q.prompt FROM questions q
+        JOIN categories c ON c.id = q.category_id
+        WHERE q.content_hash IS NULL
+    """).fetchall()
+    conn.executemany(
+        "UPDATE questions SET content_hash = ? WHERE id = ?",
+        [(question_hash(name, prompt), qid) for qid, name, prompt in rows],
+    )
+
+
+# ---------------------------------------------------------------------------
+# Bulk import
+# ---------------------------------------------------------------------------
 
-        cat_id = category_ids[cat_name]
-        cur = conn.execute(
-            "INSERT INTO questions (category_id, prompt, answer, group_name) VALUES (?, ?, ?, ?)",
-            (cat_id, entry["question"], entry["answer"], entry.get("group")),
+IMPORT_BATCH_SIZE = 500
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.read / self.seconds if self.seconds else 0.0
+
+
+def import_questions(entries: Iterable[dict], batch_size: int = IMPORT_BATCH_SIZE) -> ImportStats:
+    """Upsert questions from pack entries (see server.packs), one transaction per batch.
+
+    New questions are inserted, questions whose answer, group or lies changed
+    are rewritten, and identical ones are skipped. An interrupted import can
+    simply be run again.
+
+    A question is identified by its category and prompt together (see
+    question_hash), so moving a question to another category, or rewording
+    it, imports it as a new question and leaves the old row in place.
+    """
+    stats = ImportStats()
+    start = time.perf_counter()
+    entries = iter(entries)
+    with _connection() as conn:
+        category_ids = {name: cid for cid, name in conn.execute("SELECT id, name FROM categories")}
+        while batch := list(islice(entries, batch_size)):
+            # Lock before looking up existing rows, so two imports of the
+            # same questions (say, two servers seeding a new database) can't
+            # both decide to insert them.
+            conn.execute("BEGIN IMMEDIATE")
+            _import_batch(conn, batch, category_ids, stats)
+            conn.commit()
+    stats.seconds = time.perf_counter() - start
+    if stats.inserted or stats.updated:
+        _bump_catalog_version()
+    return stats
+
+
+def _import_batch(conn: sqlite3.Connection, batch: list[dict], category_ids: dict[str, int], stats: ImportStats) -> None:
+    stats.read += len(batch)
+    by_hash = {question_hash(e["category"], e["question"]): e for e in batch}
+    stats.unchanged += len(batch) - len(by_hash)  # repeated within the batch; the last copy wins
+
+    hashes = list(by_hash)
+    marks = ",".join("?" * len(hashes))
+    existing = {
+        row["content_hash"]: row
+        for row in conn.execute(
+            f"SELECT id, content_hash, answer, group_name FROM questions WHERE content_hash IN ({marks})", hashes
         )
-        q_id = cur.lastrowid
-        for lie_text in entry.get("lies", []):
-            conn.execute(
-                "INSERT INTO question_lies (question_id, text) VALUES (?, ?)",
-                (q_id, lie_text),
+    }
+    existing_lies: dict[int, list[str]] = {}
+    if existing:
+        ids = [row["id"] for row in existing.values()]
+        for question_id, text in conn.execute(
+            f"SELECT question_id, text FROM question_lies WHERE question_id IN ({','.join('?' * len(ids))}) ORDER BY id",
+            ids,
+        ):
+            existing_lies.setdefault(question_id, []).append(text)
+
+    new: dict[str, dict] = {}
+    changed: list[tuple[int, dict]] = []
+    for content_hash, entry in by_hash.items():
+        row = existing.get(content_hash)
+        if row is None:
+            new[content_hash] = entry
+        elif (row["answer"], row["group_name"], existing_lies.get(row["id"], [])) != (
+            entry["answer"], entry["group"], entry["lies"]
+        ):
+            changed.append((row["id"], entry))
+        else:
+            stats.unchanged += 1
+
+    missing_categories = {e["category"] for e in new.values()} - category_ids.keys()
+    if missing_categories:
+        conn.executemany("INSERT OR IGNORE INTO categories (name) VALUES (?)", [(n,) for n in missing_categories])
+        category_ids.update(
+            (name, cid) for cid, name in conn.execute(
+                f"SELECT id, name FROM categories WHERE name IN ({','.join('?' * len(missing_categories))})",
+                list(missing_categories),
             )
+        )
 
-    conn.commit()
+    lie_rows: list[tuple[int, str]] = []
+    if new:
+        conn.executemany(
+            """INSERT INTO questions (category_id, prompt, answer, group_name, answer_normalized, answer_tokens, content_hash)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (category_ids[e["category"]], e["question"], e["answer"], e["group"], *_answer_features(e["answer"]), h)
+                for h, e in new.items()
+            ],
+        )
+        new_hashes = list(new)
+        for question_id, content_hash in conn.execute(
+            f"SELECT id, content_hash FROM questions WHERE content_hash IN ({','.join('?' * len(new_hashes))})",
+            new_hashes,
+        ):
+            lie_rows.extend((question_id, lie) for lie in new[content_hash]["lies"])
+        stats.inserted += len(new)
+
+    if changed:
+        # A new answer text invalidates its stored embedding; the backfill
+        # recomputes it.
+        conn.executemany(
+            """UPDATE questions SET
+                   answer_embedding = CASE WHEN answer = ? THEN answer_embedding END,
+                   answer_embedding_model = CASE WHEN answer = ? THEN answer_embedding_model END,
+                   answer = ?, group_name = ?, answer_normalized = ?, answer_tokens = ?
+               WHERE id = ?""",
+            [
+                (e["answer"], e["answer"], e["answer"], e["group"], *_answer_features(e["answer"]), qid)
+                for qid, e in changed
+            ],
+        )
+        conn.executemany("DELETE FROM question_lies WHERE question_id = ?", [(qid,) for qid, _ in changed])
+        for qid, e in changed:
+            lie_rows.extend((qid, lie) for lie in e["lies"])
+        stats.updated += len(changed)
+
+    conn.executemany("INSERT INTO question_lies (question_id, text) VALUES (?, ?)", lie_rows)
+
+
+def _answer_features(answer: str) -> tuple[str, str]:
+    prepared = prepare_text(answer)
+    return prepared.normalized, " ".join(prepared.tokens)
 
 
 # ---------------------------------------------------------------------------
 # Read queries
 # ---------------------------------------------------------------------------
 
-def get_categories(included_groups: list[str] | None = None) -> list[dict]:
-    conn = _connect()
-    try:
-        rows = conn.execute("""
-            SELECT c.id, c.name,
-                   COUNT(q.id) AS question_count
-            FROM categories c
-            LEFT JOIN questions q ON q.category_id = c.id
-            GROUP BY c.id, c.name
-            ORDER BY c.name
-        """).fetchall()
-        return [dict(r) for r in rows]
-    finally:
-        conn.close()
+def get_category_names() -> list[tuple[int, str]]:
+    with _connection() as conn:
+        rows = conn.execute("SELECT id, name FROM categories ORDER BY name").fetchall()
+    return [tuple(r) for r in rows]
 
 
-def get_groups() -> list[dict]:
-    conn = _connect()
-    try:
-        rows = conn.execute("""
-            SELECT COALESCE(group_name, '__ungrouped__') AS name,
-                   COUNT(*) AS question_count
-            FROM questions
-            GROUP BY group_name
-            ORDER BY group_name
-        """).fetchall()
-        result = []
-        for r in rows:
-            result.append({
-                "name": "Ungrouped" if r["name"] == "__ungrouped__" else r["name"],
-                "question_count": r["question_count"],
-            })
-        return result
-    finally:
-        conn.close()
+# Hot statements whose query plans tests/test_db.py checks against the indexes.
+CATALOG_QUERY = "SELECT id, category_id, group_name FROM questions ORDER BY category_id, group_name, id"
+QUESTION_LIES_QUERY = "SELECT text FROM question_lies WHERE question_id = ? ORDER BY RANDOM()"
 
 
-def get_random_question(
-    category_id: int,
-    exclude_ids: set[int],
-    player_histories: list[dict[str, str]],
-    included_groups: list[str] | None = None,
-) -> dict | None:
-    conn = _connect()
-    try:
-        placeholders = ",".join("?" * len(exclude_ids)) if exclude_ids else "NULL"
-        group_clause = ""
-        params: list = [category_id]
-
-        if included_groups is not None:
-            group_ph = ",".join("?" * len(included_groups))
-            group_clause = f"AND (group_name IN ({group_ph}) OR group_name IS NULL)"
-            params.extend(included_groups)
-
-        if exclude_ids:
-            params.extend(list(exclude_ids))
-            exclude_clause = f"AND id NOT IN ({placeholders})"
-        else:
-            exclude_clause = ""
+def get_question_catalog() -> list[tuple[int, int, str | None]]:
+    """Every question as (id, category_id, group_name), for server.questions."""
+    with _connection() as conn:
+        rows = conn.execute(CATALOG_QUERY).fetchall()
+    return [tuple(r) for r in rows]
 
-        rows = conn.execute(f"""
-            SELECT id, prompt, answer, group_name, last_used_at
-            FROM questions
-            WHERE category_id = ?
-            {group_clause}
-            {exclude_clause}
-            ORDER BY last_used_at ASC NULLS FIRST
-        """, params).fetchall()
 
-        if not rows:
+def get_question(question_id: int) -> dict | None:
+    with _connection() as conn:
+        row = conn.execute("""
+            SELECT q.id, q.category_id, c.name AS category_name,
+                   q.prompt, q.answer, q.group_name, q.last_used_at,
+                   q.answer_normalized, q.answer_tokens,
+                   q.answer_embedding, q.answer_embedding_model
+            FROM questions q
+            JOIN categories c ON c.id = q.category_id
+            WHERE q.id = ?
+        """, (question_id,)).fetchone()
+        if row is None:
             return None
-
-        candidates = [dict(r) for r in rows]
-        weights = [_question_weight(c, player_histories) for c in candidates]
-        chosen = random.choices(candidates, weights=weights, k=1)[0]
-
-        lies_rows = conn.execute(
-            "SELECT text FROM question_lies WHERE question_id = ? ORDER BY RANDOM()",
-            (chosen["id"],),
-        ).fetchall()
-        chosen["lies"] = [r["text"] for r in lies_rows]
-
-        return chosen
-    finally:
-        conn.close()
+        question = dict(row)
+        if question["answer_embedding"] is not None:
+            vector = array("f")
+            vector.frombytes(question["answer_embedding"])
+            question["answer_embedding"] = vector
+        lies_rows = conn.execute(QUESTION_LIES_QUERY, (question_id,)).fetchall()
+    question["lies"] = [r["text"] for r in lies_rows]
+    return question
+
+
+def iter_questions(batch_size: int = IMPORT_BATCH_SIZE) -> Iterator[dict]:
+    """Every question in id order, shaped like get_question but with lies in
+    stored order and the embedding as raw float32 bytes. Used to compile packs."""
+    with _connection() as conn:
+        cursor = conn.execute("""
+            SELECT q.id, q.category_id, c.name AS category_name,
+                   q.prompt, q.answer, q.group_name,
+                   q.answer_normalized, q.answer_tokens,
+                   q.answer_embedding, q.answer_embedding_model
+            FROM questions q
+            JOIN categories c ON c.id = q.category_id
+            ORDER BY q.id
+        """)
+        while rows := cursor.fetchmany(batch_size):
+            ids = [row["id"] for row in rows]
+            lies: dict[int, list[str]] = {}
+            for question_id, text in conn.execute(
+                f"SELECT question_id, text FROM question_lies WHERE question_id IN ({','.join('?' * len(ids))}) ORDER BY id",
+                ids,
+            ):
+                lies.setdefault(question_id, []).append(text)
+            for row in rows:
+                question = dict(row)
+                question["lies"] = lies.get(question["id"], [])
+                yield question
 
 
-def _question_weight(question: dict, player_histories: list[dict[str, str]]) -> float:
-    qid = str(question["id"])
-    wrong = sum(1 for h in player_histories if h.get(qid) == "incorrect")
-    seen_correct = sum(1 for h in player_histories if h.get(qid) == "correct")
-    total_seen = wrong + seen_correct
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
 
-    if total_seen == 0:
-        return 3.0
-    if wrong > 0:
-        return 2.0 + (wrong / max(total_seen, 1))
-    return 1.0
+SEARCH_PAGE_SIZE = 50
+MAX_SEARCH_PAGE_SIZE = 200
+
+_SEARCH_TERM_RE = re.compile(r"\w+")
+
+
+def search_query(text: str) -> str | None:
+    """An FTS5 query matching every word of ``text``, the last as a prefix.
+
+    Words are quoted, so nothing a host types is read as query syntax.
+    None when ``text`` has no words.
+    """
+    terms = [f'"{term}"' for term in _SEARCH_TERM_RE.findall(text)]
+    if not terms:
+        return None
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_questions(
+    query: str | None = None,
+    category_id: int | None = None,
+    groups: list[str | None] | None = None,
+    after: int = 0,
+    limit: int = SEARCH_PAGE_SIZE,
+) -> tuple[list[dict], int | None]:
+    """One page of questions in id order, with the cursor for the next page.
+
+    ``query`` is matched against prompts and answers through questions_fts;
+    without it every question is listed. ``groups`` keeps questions in any of
+    the named groups, None standing for ungrouped ones. Pages are keyed on
+    the last id seen rather than an offset, so each is a seek into an index
+    however deep into the results it is. The cursor is None on the last page.
+    """
+    if query is not None and search_query(query) is None:
+        return [], None
+    with _connection() as conn:
+        rows = conn.execute(*_search_statement(query, category_id, groups, after, limit + 1)).fetchall()
+    questions = [dict(row) for row in rows[:limit]]
+    next_after = questions[-1]["id"] if len(rows) > limit else None
+    return questions, next_after
+
+
+def _search_statement(
+    query: str | None, category_id: int | None, groups: list[str | None] | None, after: int, limit: int,
+) -> tuple[str, list]:
+    if query is not None:
+        source = "questions_fts f JOIN questions q ON q.id = f.rowid"
+        where = ["questions_fts MATCH ?", "f.rowid > ?"]
+        params: list = [search_query(query), after]
+        order = "f.rowid"
+    else:
+        source = "questions q"
+        where = ["q.id > ?"]
+        params = [after]
+        order = "q.id"
+    if category_id is not None:
+        where.append("q.category_id = ?")
+        params.append(category_id)
+    if groups is not None:
+        named = [group for group in groups if group is not None]
+        clauses = [f"q.group_name IN ({','.join('?' * len(named))})"] if named else []
+        if None in groups:
+            clauses.append("q.group_name IS NULL")
+        where.append(f"({' OR '.join(clauses)})" if clauses else "0")
+        params.extend(named)
+    params.append(limit)
+    return f"""
+        SELECT q.id, q.category_id, c.name AS category_name,
+               q.prompt, q.answer, q.group_name, q.used_count
+        FROM {source}
+        JOIN categories c ON c.id = q.category_id
+        WHERE {' AND '.join(where)}
+        ORDER BY {order}
+        LIMIT ?
+    """, params
+
+
+def catalog_version() -> int:
+    """Bumped whenever the set of questions may have changed."""
+    return _catalog_version
+
+
+def _bump_catalog_version() -> None:
+    global _catalog_version
+    _catalog_version += 1
 
 
 def mark_questions_used(question_ids: list[int]) -> None:
     if not question_ids:
         return
     now = datetime.now(timezone.utc).isoformat()
-    conn = _connect()
-    try:
-        for qid in question_ids:
-            conn.execute(
-                "UPDATE questions SET used_count = used_count + 1, last_used_at = ? WHERE id = ?",
-                (now, qid),
+    queue_writes(
+        "UPDATE questions SET used_count = used_count + 1, last_used_at = ? WHERE id = ?",
+        [(now, qid) for qid in question_ids],
+    )
+
+
+# ---------------------------------------------------------------------------
+# Write-behind queue
+# ---------------------------------------------------------------------------
+
+# Gameplay writes (usage counts and the like) are queued and committed by one
+# background thread, so a room never waits on the disk while holding its lock.
+WRITE_BEHIND_INTERVAL = 1.0
+
+
+class _WriteBehind:
+    """Collects writes for ``interval`` seconds, then commits them in one transaction."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._pending: list[tuple[str, tuple]] = []
+        self._submitted = 0
+        self._written = 0
+        self._flushing = False
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, sql: str, rows: list[tuple]) -> None:
+        with self._cond:
+            self._pending.extend((sql, row) for row in rows)
+            self._submitted += len(rows)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush, 5.0)
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Commit everything submitted so far; False if that took longer than ``timeout``."""
+        with self._cond:
+            target = self._submitted
+            if self._written >= target:
+                return True
+            self._flushing = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._written >= target, timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                self._cond.wait_for(lambda: self._flushing, self.interval)
+                batch, self._pending = self._pending, []
+                self._flushing = False
+            try:
+                self._write(batch)
+            finally:
+                # Written or dropped, the batch is done: release flush().
+                with self._cond:
+                    self._written += len(batch)
+                    self._cond.notify_all()
+
+    def _write(self, batch: list[tuple[str, tuple]]) -> None:
+        try:
+            with _connection() as conn:
+                # Consecutive writes of the same statement go out as one
+                # executemany; order across statements is kept.
+                for sql, items in groupby(batch, key=lambda item: item[0]):
+                    conn.executemany(sql, [row for _, row in items])
+                conn.commit()
+        except Exception:
+            # Anything else escaping here would end the thread and strand
+            # every later write.
+            LOGGER.exception("Dropped %d queued database writes", len(batch))
+
+
+_write_behind = _WriteBehind(WRITE_BEHIND_INTERVAL)
+
+
+def queue_writes(sql: str, rows: list[tuple]) -> None:
+    """Run ``sql`` once per row on the write-behind thread."""
+    _write_behind.submit(sql, rows)
+
+
+def flush_writes(timeout: Optional[float] = None) -> bool:
+    return _write_behind.flush(timeout)
+
+
+# ---------------------------------------------------------------------------
+# Answer feature backfill
+# ---------------------------------------------------------------------------
+
+BACKFILL_BATCH_SIZE = 64
+
+
+def backfill_answer_features(batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Fill in normalized text, tokens and embeddings for answers missing them.
+
+    Returns the number of embeddings stored. Stops quietly at the first failed
+    embeddings request so a missing LM Studio only delays the backfill.
+    """
+    with _connection() as conn:
+        rows = conn.execute("SELECT id, answer FROM questions WHERE answer_normalized IS NULL").fetchall()
+        if rows:
+            updates = []
+            for row in rows:
+                prepared = prepare_text(row["answer"])
+                updates.append((prepared.normalized, " ".join(prepared.tokens), row["id"]))
+            conn.executemany("UPDATE questions SET answer_normalized = ?, answer_tokens = ? WHERE id = ?", updates)
+            conn.commit()
+
+    model = get_embedding_backend().model
+    stored = 0
+    while True:
+        with _connection() as conn:
+            rows = conn.execute("""
+                SELECT id, answer_normalized FROM questions
+                WHERE answer_embedding IS NULL OR answer_embedding_model IS NOT ?
+                ORDER BY id LIMIT ?
+            """, (model, batch_size)).fetchall()
+        if not rows:
+            return stored
+        try:
+            vectors = embed_texts([row["answer_normalized"] for row in rows])
+        except Exception as exc:
+            LOGGER.warning("Answer embedding backfill paused stored=%d error=%s", stored, exc)
+            return stored
+        if len(vectors) != len(rows):
+            # The rows left out would be selected again forever.
+            LOGGER.warning("Answer embedding backfill stopped: %d vectors for %d answers", len(vectors), len(rows))
+            return stored
+        with _connection() as conn:
+            conn.executemany(
+                "UPDATE questions SET answer_embedding = ?, answer_embedding_model = ? WHERE id = ?",
+                [(vector.tobytes(), model, row["id"]) for row, vector in zip(rows, vectors)],
             )
-        conn.commit()
-    finally:
-        conn.close()
+            conn.commit()
+        stored += len(rows)
+
+
+_backfill_thread: Optional[threading.Thread] = None
+_backfill_lock = threading.Lock()
+
+
+def start_answer_backfill() -> threading.Thread:
+    """Run backfill_answer_features in the background, unless it already is."""
+    global _backfill_thread
+    with _backfill_lock:
+        if _backfill_thread is None or not _backfill_thread.is_alive():
+            _backfill_thread = threading.Thread(target=backfill_answer_features, name="answer-backfill", daemon=True)
+            _backfill_thread.start()
+        return _backfill_thread
@@ -0,0 +1,179 @@
+"""
+Embedding backends.
+
+A backend turns already-normalized texts into vectors. Its ``model`` string
+names the vector space and keys the embedding cache, so vectors from two
+backends are never compared with each other.
+
+``LMStudioBackend`` calls an OpenAI-compatible ``/v1/embeddings`` endpoint over
+a keep-alive session, behind a circuit breaker so an unreachable server costs
+nothing while it is down. ``HashedNgramBackend`` needs no external process: it hashes character n-grams
+and words into a fixed-size signed vector with NumPy, falling back to plain
+Python where NumPy is missing.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+import zlib
+from typing import Callable, Optional, Protocol, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import numpy as np
+except ImportError:  # fallback only; requirements.txt installs NumPy
+    np = None
+
+LOGGER = logging.getLogger(__name__)
+
+
+class EmbeddingBackend(Protocol):
+    model: str
+    remote: bool  # True when embed() waits on another process
+
+    def embed(self, texts: list[str], timeout: Optional[float] = None) -> list[Sequence[float]]:
+        ...
+
+
+class EmbeddingUnavailable(RuntimeError):
+    """Raised instead of calling a backend whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stops calling a failing service for ``cooldown`` seconds.
+
+    Opens after ``failure_threshold`` consecutive failures. Once the cooldown
+    has passed a single call is let through as a probe: success closes the
+    breaker, failure restarts the cooldown.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or self._clock() - self._opened_at < self.cooldown:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is None and self._failures < self.failure_threshold:
+                return
+            if self._opened_at is None:
+                LOGGER.warning("Embedding service unavailable, skipping it for %.0fs", self.cooldown)
+            self._opened_at = self._clock()
+
+
+class LMStudioBackend:
+    remote = True
+
+    def __init__(
+        self,
+        url: str,
+        model: str,
+        timeout: float,
+        pool_size: int = 8,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.url = url
+        self.model = model
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        # One keep-alive connection per concurrent caller instead of a new
+        # TCP handshake for every request.
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def embed(self, texts: list[str], timeout: Optional[float] = None) -> list[Sequence[float]]:
+        if not self.breaker.allow():
+            raise EmbeddingUnavailable(f"{self.url} is cooling down after repeated failures")
+        try:
+            resp = self.session.post(
+                f"{self.url}/v1/embeddings",
+                json={"input": texts, "model": self.model},
+                timeout=self.timeout if timeout is None else timeout,
+            )
+            resp.raise_for_status()
+            vectors = [item["embedding"] for item in resp.json()["data"]]
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return vectors
+
+
+class HashedNgramBackend:
+    """CPU-only, deterministic stand-in for a learned embedding model.
+
+    Features are the character 2- to 4-grams of the padded text plus each whole
+    word. Each is hashed with CRC-32 (stable across processes, unlike
+    ``hash()``) to a bucket and a sign, and the result is L2-normalized, so the
+    cosine of two vectors approximates their n-gram overlap.
+    """
+
+    remote = False
+
+    def __init__(self, dim: int = 512, ngram_sizes: tuple[int, ...] = (2, 3, 4)):
+        self.dim = dim
+        self.ngram_sizes = ngram_sizes
+        self.model = f"local-hashed-ngrams-{dim}"
+
+    def embed(self, texts: list[str], timeout: Optional[float] = None) -> list[Sequence[float]]:
+        return [self._vector(text) for text in texts]
+
+    def _hashes(self, text: str) -> list[int]:
+        padded = f" {text} "
+        features = [
+            padded[i:i + n]
+            for n in self.ngram_sizes
+            for i in range(len(padded) - n + 1)
+        ]
+        features.extend(f"w:{word}" for word in text.split())
+        return [zlib.crc32(feature.encode("utf-8")) for feature in features]
+
+    def _vector(self, text: str) -> Sequence[float]:
+        hashes = self._hashes(text)
+        if np is not None:
+            codes = np.array(hashes, dtype=np.uint32)
+            signs = np.where(codes >> 31, -1.0, 1.0)
+            vector = np.bincount(codes % self.dim, weights=signs, minlength=self.dim).astype(np.float32)
+            norm = float(np.linalg.norm(vector))
+            return vector / norm if norm else vector
+
+        vector = [0.0] * self.dim
+        for code in hashes:
+            vector[code % self.dim] += -1.0 if code >> 31 else 1.0
+        norm = math.sqrt(sum(x * x for x in vector))
+        return [x / norm for x in vector] if norm else vector
@@ -0,0 +1,168 @@
+"""
+Two-tier cache for text embeddings, keyed by (model, normalized text).
+
+Lookups hit a bounded in-memory LRU first and fall back to a SQLite table of
+float32 blobs, so vectors survive restarts and a repeated similarity check
+costs a dictionary lookup instead of an embeddings request. The database file
+is only created once there is something to store, and any SQLite or file error
+just degrades the cache to memory only.
+
+The lock guards the memory tier alone. Disk reads and writes go through a
+small pool of connections outside it, so concurrent lie checks never queue
+behind each other's I/O.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 4096
+POOL_SIZE = 8
+
+
+class EmbeddingCache:
+    def __init__(self, path: Optional[Path], max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._memory: OrderedDict[tuple[str, str], array] = OrderedDict()
+        self._lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        self._pool: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue(maxsize=POOL_SIZE)
+
+    def get_many(self, model: str, texts: Iterable[str]) -> dict[str, array]:
+        found: dict[str, array] = {}
+        missing: list[str] = []
+        with self._lock:
+            for text in texts:
+                vector = self._memory.get((model, text))
+                if vector is None:
+                    missing.append(text)
+                else:
+                    self._memory.move_to_end((model, text))
+                    found[text] = vector
+        if missing:
+            loaded = self._load(model, missing)
+            with self._lock:
+                for text, vector in loaded:
+                    self._remember(model, text, vector)
+                    found[text] = vector
+        return found
+
+    def put_many(self, model: str, vectors: dict[str, Sequence[float]]) -> dict[str, array]:
+        stored = {text: array("f", vector) for text, vector in vectors.items()}
+        with self._lock:
+            for text, vector in stored.items():
+                self._remember(model, text, vector)
+        self._store(model, stored)
+        return stored
+
+    def prime(self, model: str, vectors: dict[str, Sequence[float]]) -> None:
+        """Load vectors persisted elsewhere into the memory tier only."""
+        with self._lock:
+            for text, vector in vectors.items():
+                self._remember(model, text, array("f", vector))
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _remember(self, model: str, text: str, vector: array) -> None:
+        self._memory[(model, text)] = vector
+        self._memory.move_to_end((model, text))
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    @contextmanager
+    def _connection(self, create: bool) -> Iterator[Optional[sqlite3.Connection]]:
+        """Borrow a pooled connection; None while there is no database to read."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect(create)
+        if conn is None:
+            yield None
+            return
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def _connect(self, create: bool) -> Optional[sqlite3.Connection]:
+        if self.path is None or not (create or self.path.exists()):
+            return None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            # Connections opened together on a new file can fail the WAL
+            # switch with "database is locked", so set them up one at a time.
+            with self._connect_lock:
+                conn.executescript("""
+                    PRAGMA journal_mode=WAL;
+                    PRAGMA synchronous=NORMAL;
+                    PRAGMA busy_timeout=5000;
+
+                    CREATE TABLE IF NOT EXISTS embeddings (
+                        model  TEXT NOT NULL,
+                        text   TEXT NOT NULL,
+                        vector BLOB NOT NULL,
+                        PRIMARY KEY (model, text)
+                    ) WITHOUT ROWID;
+                """)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _load(self, model: str, texts: list[str]) -> list[tuple[str, array]]:
+        try:
+            with self._connection(create=False) as conn:
+                if conn is None:
+                    return []
+                rows = conn.execute(
+                    "SELECT text, vector FROM embeddings WHERE model = ? AND text IN (SELECT value FROM json_each(?))",
+                    (model, json.dumps(texts)),
+                ).fetchall()
+        except (sqlite3.Error, OSError) as exc:
+            LOGGER.warning("Embedding cache read failed path=%s error=%s", self.path, exc)
+            return []
+        loaded = []
+        for text, blob in rows:
+            vector = array("f")
+            vector.frombytes(blob)
+            loaded.append((text, vector))
+        return loaded
+
+    def _store(self, model: str, vectors: dict[str, array]) -> None:
+        try:
+            with self._connection(create=True) as conn:
+                if conn is None:
+                    return
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (model, text, vector) VALUES (?, ?, ?)",
+                        [(model, text, vector.tobytes()) for text, vector in vectors.items()],
+                    )
+        except (sqlite3.Error, OSError) as exc:
+            LOGGER.warning("Embedding cache write failed path=%s error=%s", self.path, exc)
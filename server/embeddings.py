@@ -1,19 +1,55 @@
 from __future__ import annotations
 
+import atexit
 import logging
-import math
+import os
 import re
-from difflib import SequenceMatcher
-from typing import Optional
+from array import array
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Optional, Sequence
 
-import requests
+
+from server.embedding_backends import EmbeddingBackend, HashedNgramBackend, LMStudioBackend
+from server.embedding_cache import EmbeddingCache
+from server.fuzzy import FuzzyPattern
+from server.similarity import cosine, similarity_matrix
 
 LOGGER = logging.getLogger(__name__)
 
 LM_STUDIO_URL = "http://localhost:1234"
 EMBEDDING_MODEL = "text-embedding-nomic-embed-text-v2"
 SIMILARITY_THRESHOLD = 0.75
+# Two players' lies merge into one voting option at or above this similarity.
+DUPLICATE_LIE_THRESHOLD = 0.9
 _EMBED_TIMEOUT = 2.0
+# Longest a lie check waits on a remote model before using the heuristic
+# verdict, so a slow server cannot stall submissions. The request timeout
+# alone restarts for connect and read, so the call runs on _embed_pool and is
+# abandoned at the deadline; it still fills the cache when it finishes.
+LIE_CHECK_BUDGET = 0.5
+_EMBED_POOL_SIZE = 8
+_embed_pool = ThreadPoolExecutor(_EMBED_POOL_SIZE, thread_name_prefix="lie-check-embed")
+EMBEDDING_CACHE_PATH = Path(__file__).parent.parent / "data" / "embeddings.db"
+
+# EMBEDDING_BACKEND=local swaps LM Studio for the in-process hashed n-gram
+# model, for venues without an embeddings service.
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "lmstudio")
+
+_cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
+# Closing the last connection checkpoints the WAL and removes its sidecar
+# files. Look _cache up at exit, since the benchmarks swap it out.
+atexit.register(lambda: _cache.close())
+
+
+def _default_backend() -> EmbeddingBackend:
+    if EMBEDDING_BACKEND == "local":
+        return HashedNgramBackend()
+    return LMStudioBackend(LM_STUDIO_URL, EMBEDDING_MODEL, _EMBED_TIMEOUT, pool_size=_EMBED_POOL_SIZE)
+
+
+_backend: EmbeddingBackend = _default_backend()
 
 _NUMBER_WORDS = {
     "zero": 0,
@@ -46,15 +82,33 @@ _NUMBER_WORDS = {
     "ninety": 90,
 }
 _SCALE_WORDS = {"hundred": 100, "thousand": 1000}
-_NUMBER_TOKEN_RE = re.compile(r"[a-z]+(?:-[a-z]+)*|\d+|[^\w\s]", re.IGNORECASE)
+_NUMBER_LEXICON = frozenset(_NUMBER_WORDS) | frozenset(_SCALE_WORDS)
+# Each match fills exactly one group: a (possibly hyphenated) word, a run of
+# digits, or a single punctuation mark.
+_NUMBER_TOKEN_RE = re.compile(r"([a-z]+(?:-[a-z]+)*)|(\d+)|([^\w\s])", re.IGNORECASE)
+# Punctuation written flush against the preceding token.
+_ATTACHED_PUNCTUATION = frozenset(",.;:!?")
+
+
+class PreparedText(NamedTuple):
+    """An answer's normalized text and word tokens, computed once at import."""
+    normalized: str
+    tokens: tuple[str, ...]
+
+
+def prepare_text(text: str) -> PreparedText:
+    normalized = _normalize_text(text)
+    return PreparedText(normalized, tuple(_word_tokens(normalized)))
 
 
-def is_too_similar(lie: str, truth: str) -> bool:
+def is_too_similar(lie: str, truth: str, prepared_truth: Optional[PreparedText] = None) -> bool:
     normalized_lie = _normalize_text(lie)
-    normalized_truth = _normalize_text(truth)
-    heuristic_reason = _heuristic_too_similar(normalized_lie, normalized_truth)
+    if prepared_truth is None:
+        prepared_truth = prepare_text(truth)
+    normalized_truth = prepared_truth.normalized
+    heuristic_reason = _heuristic_too_similar(normalized_lie, normalized_truth, prepared_truth.tokens)
     try:
-        similarity = _embedding_similarity(normalized_lie, normalized_truth)
+        similarity = _similarity_within_budget(normalized_lie, normalized_truth)
         result = similarity >= SIMILARITY_THRESHOLD or heuristic_reason is not None
         LOGGER.debug(
             "Embedding similarity check lie=%r truth=%r normalized_lie=%r normalized_truth=%r similarity=%.6f threshold=%.6f heuristic=%s result=%s",
@@ -83,53 +137,154 @@ def is_too_similar(lie: str, truth: str) -> bool:
         return fallback
 
 
+def _similarity_within_budget(a: str, b: str) -> float:
+    if not _backend.remote:
+        return _embedding_similarity(a, b)
+    future = _embed_pool.submit(_embedding_similarity, a, b, LIE_CHECK_BUDGET)
+    try:
+        return future.result(timeout=LIE_CHECK_BUDGET)
+    except FutureTimeout:
+        future.cancel()
+        raise TimeoutError(f"no embedding within the {LIE_CHECK_BUDGET}s lie check budget") from None
+
+
 def normalize_answer_text(text: str) -> str:
     return _normalize_text(text)
 
 
-def _embedding_similarity(a: str, b: str) -> float:
-    url = f"{LM_STUDIO_URL}/v1/embeddings"
-    resp = requests.post(
-        url,
-        json={"input": [a, b], "model": EMBEDDING_MODEL},
-        timeout=_EMBED_TIMEOUT,
-    )
-    resp.raise_for_status()
-    data = resp.json()["data"]
-    vec_a = data[0]["embedding"]
-    vec_b = data[1]["embedding"]
+def embed_texts(texts: list[str]) -> list[array]:
+    """Embeddings for already-normalized texts, going through the cache."""
+    return _embed(texts)
+
+
+def prime_embedding(text: str, vector: Sequence[float], model: str) -> None:
+    """Seed the in-memory cache with a vector stored alongside a question."""
+    if model == _backend.model:
+        _cache.prime(model, {text: vector})
+
+
+def group_near_duplicates(texts: list[str], threshold: float = DUPLICATE_LIE_THRESHOLD) -> list[list[int]]:
+    """Group indexes of ``texts`` that normalize alike or embed within ``threshold``.
+
+    Groups keep their members in input order, and the groups are ordered by
+    their first member. Never waits on a remote backend: vectors come from
+    the cache (every accepted lie was embedded when it was checked) or from a
+    local backend, and texts without one only match on normalized text.
+    """
+    normalized = [_normalize_text(text) for text in texts]
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i: int, j: int) -> None:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    first_seen: dict[str, int] = {}
+    for i, text in enumerate(normalized):
+        union(first_seen.setdefault(text, i), i)
+
+    vectors = _available_embeddings(normalized)
+    embedded = [i for i, vector in enumerate(vectors) if vector is not None]
+    matrix = similarity_matrix([vectors[i] for i in embedded])
+    for row, i in enumerate(embedded):
+        for col in range(row + 1, len(embedded)):
+            if matrix[row][col] >= threshold:
+                union(i, embedded[col])
+
+    groups: dict[int, list[int]] = {}
+    for i in range(len(texts)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def _available_embeddings(texts: list[str]) -> list[Optional[array]]:
+    backend = _backend
+    found = _cache.get_many(backend.model, texts)
+    missing = [text for text in texts if text not in found]
+    if missing and not backend.remote:
+        found.update(_cache.put_many(backend.model, dict(zip(missing, backend.embed(missing)))))
+    return [found.get(text) for text in texts]
+
+
+def get_embedding_backend() -> EmbeddingBackend:
+    return _backend
+
+
+def set_embedding_backend(backend: EmbeddingBackend) -> None:
+    global _backend
+    _backend = backend
+
+
+def _embedding_similarity(a: str, b: str, timeout: Optional[float] = None) -> float:
+    vec_a, vec_b = _embed([a, b], timeout)
     return _cosine(vec_a, vec_b)
 
 
+def _embed(texts: list[str], timeout: Optional[float] = None) -> list[array]:
+    """Embeddings for already-normalized texts; only cache misses are requested."""
+    backend = _backend
+    found = _cache.get_many(backend.model, texts)
+    missing = [text for text in texts if text not in found]
+    if missing:
+        vectors = backend.embed(missing, timeout=timeout)
+        found.update(_cache.put_many(backend.model, dict(zip(missing, vectors))))
+    return [found[text] for text in texts]
+
+
 def _normalize_text(text: str) -> str:
+    """Lowercase, spell number words as digits and tidy punctuation spacing.
+
+    One tokenizer pass; number phrases are only parsed where a token is a
+    number word, and each distinct phrase is parsed once per process.
+    """
     tokens = _NUMBER_TOKEN_RE.findall(text.lower())
-    normalized: list[str] = []
+    words = [word for word, _, _ in tokens]
+    parts: list[str] = []
     i = 0
-    while i < len(tokens):
-        replacement, consumed = _consume_number_tokens(tokens, i)
-        if consumed:
-            normalized.append(replacement)
-            i += consumed
-            continue
-        token = tokens[i]
-        if re.fullmatch(r"[^\w\s]", token):
-            if normalized:
-                normalized[-1] = normalized[-1].rstrip()
-            normalized.append(token)
-        else:
-            normalized.append(token)
+    count = len(tokens)
+    while i < count:
+        word, digits, mark = tokens[i]
+        if word and _is_number_word(word):
+            end = i + 1
+            while end < count and (words[end] == "and" or _is_number_word(words[end])):
+                end += 1
+            replacement, consumed = _parse_number_phrase(tuple(words[i:end]))
+            if consumed:
+                if parts:
+                    parts.append(" ")
+                parts.append(replacement)
+                i += consumed
+                continue
+        if parts and mark not in _ATTACHED_PUNCTUATION:
+            parts.append(" ")
+        parts.append(word or digits or mark)
         i += 1
-    text = " ".join(normalized)
-    text = re.sub(r"\s+([,.;:!?])", r"\1", text)
-    return re.sub(r"\s+", " ", text).strip()
+    return "".join(parts)
+
+
+def _is_number_word(token: str) -> bool:
+    if token in _NUMBER_LEXICON:
+        return True
+    return "-" in token and all(part in _NUMBER_WORDS for part in token.split("-"))
+
+
+@lru_cache(maxsize=1024)
+def _parse_number_phrase(words: tuple[str, ...]) -> tuple[str, int]:
+    return _consume_number_tokens(list(words), 0)
 
 
-def _heuristic_too_similar(a: str, b: str) -> Optional[str]:
+def _heuristic_too_similar(a: str, b: str, tokens_b: Optional[Sequence[str]] = None) -> Optional[str]:
     if a == b:
         return "exact-normalized-match"
 
     tokens_a = _word_tokens(a)
-    tokens_b = _word_tokens(b)
+    tokens_b = list(tokens_b) if tokens_b is not None else _word_tokens(b)
     if not tokens_a or not tokens_b:
         return None
 
@@ -155,8 +310,7 @@ def _fuzzy_token_subset_match(tokens_a: list[str], tokens_b: list[str]) -> bool:
         return False
     matched = []
     for token in shorter:
-        ratios = [SequenceMatcher(None, token, candidate).ratio() for candidate in longer]
-        best_ratio = max(ratios, default=0.0)
+        best_ratio = FuzzyPattern(token).best_ratio(longer, cutoff=0.88)
         if best_ratio < 0.88:
             return False
         matched.append(best_ratio)
@@ -272,10 +426,5 @@ def _words_to_number(words: list[str]) -> Optional[int]:
     return total
 
 
-def _cosine(a: list[float], b: list[float]) -> float:
-    dot = sum(x * y for x, y in zip(a, b))
-    mag_a = math.sqrt(sum(x * x for x in a))
-    mag_b = math.sqrt(sum(y * y for y in b))
-    if mag_a == 0 or mag_b == 0:
-        return 0.0
-    return dot / (mag_a * mag_b)
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    return cosine(a, b)
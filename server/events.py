@@ -1,42 +1,102 @@
 from __future__ import annotations
 
-from flask_socketio import emit
+import time
 
-from server import game_state_lock, socketio
-from server.game import active_players, get_game, sanitize_state
+from flask import request
+from flask_socketio import emit, join_room
+
+from server.game import DEFAULT_ROOM_CODE, active_players, get_game
+from server.sync import broadcast_state, full_state
+
+# Socket.IO sid → room code, recorded from the ?room= query on connect.
+_socket_rooms: dict[str, str] = {}
+
+
+# Each game is split into two Socket.IO rooms so a broadcast only reaches the
+# sockets that render it: the shared display(s), and phones that have
+# identified as a player in the game. Phones still on the join form get the
+# state once on connect and nothing more until they identify.
+
+def main_room(room_code: str) -> str:
+    return f"{room_code}:main"
+
+
+def players_room(room_code: str) -> str:
+    return f"{room_code}:players"
+
+
+def player_room(room_code: str, player_id: str) -> str:
+    """Every socket identified as one player, for replies meant only for them."""
+    return f"{room_code}:player:{player_id}"
+
+
+def room_audience(room_code: str) -> list[str]:
+    return [main_room(room_code), players_room(room_code)]
+
+
+def _socket_game():
+    return get_game(_socket_rooms.get(request.sid, DEFAULT_ROOM_CODE))
 
 
 def register_events(sio) -> None:
 
     @sio.on("connect")
     def on_connect():
-        game = get_game()
-        emit("game_state", sanitize_state(game))
+        room_code = (request.args.get("room") or DEFAULT_ROOM_CODE).upper()
+        game = get_game(room_code)
+        if game is None:
+            return False
+        _socket_rooms[request.sid] = room_code
+        if request.args.get("role") != "player":
+            join_room(main_room(room_code))
+        emit("game_state", full_state(game))
 
     @sio.on("disconnect")
-    def on_disconnect():
-        game = get_game()
+    def on_disconnect(reason=None):
+        _socket_rooms.pop(request.sid, None)
         # Identify player by their stored sid — clients must emit "identify"
         # after connecting so we know which UUID maps to this socket.
         # Until then, disconnection is a no-op.
-        pass
 
     @sio.on("identify")
     def on_identify(data):
         player_id = (data or {}).get("player_id", "")
-        game = get_game()
-        with game_state_lock:
+        game = _socket_game()
+        if game is None:
+            return
+        with game.lock:
             player = game.players.get(player_id)
             if not player:
                 return
             player.connected = True
-        emit("game_state", sanitize_state(game), broadcast=True)
+        join_room(players_room(game.room_code))
+        join_room(player_room(game.room_code, player_id))
+        # Patches sent before this socket joined the players room never reached
+        # it, so start it from a full state.
+        emit("game_state", full_state(game))
+        broadcast_state(game, to=room_audience(game.room_code))
+
+    @sio.on("clock_sync")
+    def on_clock_sync(data=None):
+        # Acked straight back: the client measures the round trip and derives
+        # its offset from server time, then counts down from deadline_ts
+        # locally instead of waiting for per-second ticks.
+        return {"client_ts": (data or {}).get("client_ts"), "server_ts": time.time()}
+
+    @sio.on("resync")
+    def on_resync(data=None):
+        game = _socket_game()
+        if game is None:
+            return
+        emit("game_state", full_state(game))
 
     @sio.on("player_disconnect")
     def on_player_disconnect(data):
         player_id = (data or {}).get("player_id", "")
-        game = get_game()
-        with game_state_lock:
+        game = _socket_game()
+        if game is None:
+            return
+        with game.lock:
             player = game.players.get(player_id)
             if not player:
                 return
@@ -47,7 +107,7 @@ def register_events(sio) -> None:
                 from server.game import current_picker
                 picker = current_picker(game)
                 if picker and picker.player_id == player_id:
-                    from server.db import get_categories
+                    from server.questions import get_categories
                     import random
                     cats = get_categories(game.included_groups)
                     if cats:
@@ -55,4 +115,4 @@ def register_events(sio) -> None:
                         from server.routes import _do_setup_turn
                         _do_setup_turn(game, chosen["id"], chosen["name"])
 
-        socketio.emit("game_state", sanitize_state(game))
+        broadcast_state(game, to=room_audience(game.room_code))
@@ -0,0 +1,73 @@
+"""
+Fuzzy string matching.
+
+Similarity is the Indel ratio ``2 * LCS / (len(a) + len(b))``. That is the
+scale of ``difflib.SequenceMatcher.ratio()``, and never below it, since the
+longest common subsequence is at least as long as the blocks SequenceMatcher
+matches. The LCS length comes from Hyyrö's bit-parallel algorithm, a relative
+of Myers' edit-distance algorithm: a Python int serves as a bit vector as wide
+as the pattern, and each character of a candidate costs a few integer
+operations instead of a row of a DP table.
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+
+class FuzzyPattern:
+    """A string prepared once for matching against many candidates."""
+
+    __slots__ = ("text", "_masks", "_full")
+
+    def __init__(self, text: str):
+        self.text = text
+        masks: dict[str, int] = {}
+        for i, char in enumerate(text):
+            masks[char] = masks.get(char, 0) | (1 << i)
+        self._masks = masks
+        self._full = (1 << len(text)) - 1
+
+    def ratio(self, other: str, cutoff: float = 0.0) -> float:
+        """Similarity to ``other``, or 0.0 when it falls below ``cutoff``."""
+        total = len(self.text) + len(other)
+        if total == 0:
+            return 1.0
+        # The LCS is at most the shorter length, and every character of
+        # ``other`` missing from the pattern is one it can never include.
+        needed = int(cutoff * total / 2)
+        if min(len(self.text), len(other)) < needed:
+            return 0.0
+        lcs = self._lcs_length(other, len(other) - needed)
+        score = 2 * lcs / total
+        return score if score >= cutoff else 0.0
+
+    def best_ratio(self, candidates: Iterable[str], cutoff: float = 0.0) -> float:
+        """Highest similarity to any candidate; 0.0 when none reaches ``cutoff``."""
+        best = 0.0
+        for candidate in candidates:
+            score = self.ratio(candidate, max(cutoff, best))
+            if score > best:
+                best = score
+                if best == 1.0:
+                    break
+        return best
+
+    def _lcs_length(self, other: str, max_misses: int) -> int:
+        masks = self._masks
+        full = self._full
+        row = full
+        misses = 0
+        for char in other:
+            match = masks.get(char)
+            if match is None:
+                misses += 1
+                if misses > max_misses:
+                    return 0
+                continue
+            common = row & match
+            row = ((row + common) | (row - common)) & full
+        return len(self.text) - bin(row).count("1")
+
+
+def ratio(a: str, b: str) -> float:
+    return FuzzyPattern(a).ratio(b)
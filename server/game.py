@@ -1,11 +1,16 @@
 from __future__ import annotations
+import json
 import random
+import string
+import threading
+import time
 import uuid
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from typing import Optional
 
-from server.embeddings import normalize_answer_text
+from server.embeddings import PreparedText, group_near_duplicates, normalize_answer_text
+from server.timers import TimerHandle, call_later, cancel_phase_timer
 
 CORRECT_GUESS_BASE = 1000
 FOOLED_BASE = 500
@@ -18,6 +23,12 @@ ROUND_CONFIG = [
 
 MIN_ANSWER_OPTIONS = 3
 
+DEFAULT_ROOM_CODE = "MAIN"
+ROOM_CODE_LENGTH = 4
+ROOM_CODE_ALPHABET = "".join(c for c in string.ascii_uppercase if c not in "IO")
+ROOM_IDLE_TIMEOUT_S = 2 * 60 * 60
+ROOM_SWEEP_INTERVAL_S = 5 * 60
+
 
 @dataclass
 class Player:
@@ -45,6 +56,14 @@ class Answer:
     likes: int = 0
     voted_by: list[str] = field(default_factory=list)
     liked_by: list[str] = field(default_factory=list)
+    # Players whose near-identical lie was merged into this one; they share
+    # its credit with author_id.
+    co_author_ids: list[str] = field(default_factory=list)
+    normalized_text: str = ""  # filled in on creation; broadcasts reuse it
+
+    def __post_init__(self) -> None:
+        if not self.normalized_text:
+            self.normalized_text = normalize_answer_text(self.text)
 
 
 @dataclass
@@ -67,10 +86,13 @@ class Turn:
     question_id: Optional[int] = None
     question_prompt: Optional[str] = None
     real_answer_text: Optional[str] = None
+    real_answer_prepared: Optional[PreparedText] = field(default=None, repr=False)
     real_answer_id: Optional[str] = None
     answers: list[Answer] = field(default_factory=list)
     score_changes: dict[str, int] = field(default_factory=dict)
     appeals: list[Appeal] = field(default_factory=list)
+    # Players whose lie is still being similarity-checked outside the lock.
+    pending_lie_ids: set[str] = field(default_factory=set)
 
 
 @dataclass
@@ -82,6 +104,28 @@ class Round:
     current_turn: Optional[Turn] = None
 
 
+class RoomLock:
+    """The lock that serializes mutations within one room.
+
+    It also bumps ``game.mutation_version`` on entry and on exit, so the
+    version is odd while a mutation is in progress and changes after every
+    critical section. sanitize_state() uses this to cache its output.
+    """
+
+    def __init__(self, game: "GameState"):
+        self._lock = threading.Lock()
+        self._game = game
+
+    def __enter__(self) -> "RoomLock":
+        self._lock.acquire()
+        self._game.mutation_version += 1
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._game.mutation_version += 1
+        self._lock.release()
+
+
 @dataclass
 class GameState:
     phase: str = "lobby"
@@ -91,22 +135,98 @@ class GameState:
     active_player_index: int = 0
     used_question_ids: set[int] = field(default_factory=set)
     included_groups: Optional[list[str]] = None
+    question_pool: Optional[object] = field(default=None, repr=False, compare=False)  # server.questions.QuestionPool
     phase_deadline: Optional[datetime] = None
     phase_token: int = 0
+    phase_timer: Optional[object] = field(default=None, repr=False, compare=False)  # server.timers.TimerHandle
+    room_code: str = DEFAULT_ROOM_CODE
+    last_active_at: float = field(default_factory=time.time)
+    # Serializes mutations within this room only. Readers (GET /game/state,
+    # broadcasts) never take it.
+    lock: RoomLock = field(init=False, repr=False, compare=False)
+    mutation_version: int = 0
+    # (mutation_version, sanitized dict, encoded JSON or None)
+    sanitized_cache: Optional[tuple] = field(default=None, repr=False, compare=False)
+    # Versioned state sync (see server/sync.py): the last state broadcast to
+    # clients and its version number.
+    state_version: int = 0
+    synced_state: Optional[dict] = field(default=None, repr=False, compare=False)
+    sync_lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.lock = RoomLock(self)
+
 
+# ---------------------------------------------------------------------------
+# Room registry
+# ---------------------------------------------------------------------------
 
-# Module-level singleton
-_game: GameState = GameState()
+# room_code → GameState. The default room always exists so the unscoped
+# /api/... routes and the launcher keep working.
+_rooms: dict[str, GameState] = {DEFAULT_ROOM_CODE: GameState()}
+_rooms_lock = threading.Lock()  # guards the registry itself, never held during gameplay
+_room_sweep: Optional[TimerHandle] = None  # pending idle-room sweep, once a room has been created
+
+
+def get_game(room_code: str = DEFAULT_ROOM_CODE) -> Optional[GameState]:
+    game = _rooms.get(room_code.upper())
+    if game:
+        game.last_active_at = time.time()
+    return game
+
+
+def reset_game(room_code: str = DEFAULT_ROOM_CODE) -> GameState:
+    room_code = room_code.upper()
+    game = GameState(room_code=room_code)
+    with _rooms_lock:
+        previous = _rooms.get(room_code)
+        if previous:
+            # Keep versions monotonic so clients never see the counter go back.
+            game.state_version = previous.state_version
+            _retire(previous)
+        _rooms[room_code] = game
+    return game
+
+
+def create_room() -> GameState:
+    global _room_sweep
+    with _rooms_lock:
+        if _room_sweep is None:
+            _room_sweep = call_later(ROOM_SWEEP_INTERVAL_S, _sweep_idle_rooms)
+        while True:
+            code = "".join(random.choices(ROOM_CODE_ALPHABET, k=ROOM_CODE_LENGTH))
+            if code not in _rooms:
+                game = GameState(room_code=code)
+                _rooms[code] = game
+                return game
+
+
+def expire_idle_rooms(max_idle_s: float = ROOM_IDLE_TIMEOUT_S) -> list[str]:
+    cutoff = time.time() - max_idle_s
+    with _rooms_lock:
+        expired = [
+            code for code, game in _rooms.items()
+            if code != DEFAULT_ROOM_CODE and game.last_active_at < cutoff
+        ]
+        for code in expired:
+            _retire(_rooms.pop(code))
+    return expired
 
 
-def get_game() -> GameState:
-    return _game
+def _sweep_idle_rooms() -> None:
+    """Expire idle rooms, then schedule the next sweep."""
+    global _room_sweep
+    try:
+        expire_idle_rooms()
+    finally:
+        with _rooms_lock:
+            _room_sweep = call_later(ROOM_SWEEP_INTERVAL_S, _sweep_idle_rooms)
 
 
-def reset_game() -> GameState:
-    global _game
-    _game = GameState()
-    return _game
+def _retire(game: GameState) -> None:
+    """Stop a replaced or expired room's pending deadline from firing later."""
+    game.phase_token += 1
+    cancel_phase_timer(game)
 
 
 # ---------------------------------------------------------------------------
@@ -181,6 +301,7 @@ def _eligible_appeal_voters(game: GameState) -> set[str]:
 
 def start_game(game: GameState) -> None:
     game.used_question_ids = set()
+    game.question_pool = None
     game.active_player_index = 0
     game.current_round = Round(**{k: v for k, v in ROUND_CONFIG[0].items()})
     game.phase = "category_pick"
@@ -201,7 +322,7 @@ def _reset_per_turn_player_flags(game: GameState) -> None:
 
 def setup_turn(game: GameState, category_id: int, category_name: str,
                question_id: int, question_prompt: str, real_answer_text: str,
-               bot_lies: list[str]) -> None:
+               bot_lies: list[str], real_answer_prepared: Optional[PreparedText] = None) -> None:
     rnd = game.current_round
     turn_number = rnd.turns_completed + 1
     picker = current_picker(game)
@@ -214,6 +335,7 @@ def setup_turn(game: GameState, category_id: int, category_name: str,
         question_id=question_id,
         question_prompt=question_prompt,
         real_answer_text=real_answer_text,
+        real_answer_prepared=real_answer_prepared,
     )
 
     real_answer = Answer(
@@ -221,6 +343,7 @@ def setup_turn(game: GameState, category_id: int, category_name: str,
         text=real_answer_text,
         author_id=None,
         is_real=True,
+        normalized_text=real_answer_prepared.normalized if real_answer_prepared else "",
     )
     turn.real_answer_id = real_answer.answer_id
     turn.answers = [real_answer]
@@ -250,11 +373,17 @@ def submit_lie(game: GameState, player_id: str, text: str) -> None:
     game.players[player_id].has_submitted_lie = True
 
 
+def answer_author_ids(answer: Answer) -> list[str]:
+    return ([answer.author_id] if answer.author_id else []) + answer.co_author_ids
+
+
 def finalize_answers(game: GameState) -> None:
     turn = game.current_round.current_turn
     bot_lies: list[str] = getattr(turn, "_bot_lies", [])  # type: ignore[attr-defined]
     active = active_players(game)
 
+    _merge_duplicate_lies(turn)
+
     # Pad with bot lies if needed
     player_submissions = [a for a in turn.answers if not a.is_real and not a.is_bot]
     total = len(player_submissions) + 1  # +1 for real answer
@@ -273,6 +402,19 @@ def finalize_answers(game: GameState) -> None:
     game.phase_token += 1
 
 
+def _merge_duplicate_lies(turn: Turn) -> None:
+    """Fold near-identical player lies into the first one submitted."""
+    lies = [a for a in turn.answers if not a.is_real and not a.is_bot]
+    if len(lies) < 2:
+        return
+    for group in group_near_duplicates([a.text for a in lies]):
+        keeper = lies[group[0]]
+        for index in group[1:]:
+            duplicate = lies[index]
+            keeper.co_author_ids.extend(answer_author_ids(duplicate))
+            turn.answers.remove(duplicate)
+
+
 # ---------------------------------------------------------------------------
 # Voting
 # ---------------------------------------------------------------------------
@@ -299,9 +441,10 @@ def cast_like(game: GameState, player_id: str, answer_id: str) -> None:
     answer = _get_answer(turn, answer_id)
     answer.likes += 1
     answer.liked_by.append(player_id)
-    author = game.players.get(answer.author_id) if answer.author_id else None
-    if author:
-        author.likes_received += 1
+    for author_id in answer_author_ids(answer):
+        author = game.players.get(author_id)
+        if author:
+            author.likes_received += 1
 
 
 def mark_likes_done(game: GameState, player_id: str) -> None:
@@ -334,10 +477,11 @@ def compute_scores(game: GameState) -> None:
     for answer in turn.answers:
         if answer.is_real or answer.is_bot or answer.author_id is None:
             continue
-        for _ in answer.voted_by:
-            delta = FOOLED_BASE * multiplier
-            game.players[answer.author_id].score += delta
-            score_changes[answer.author_id] = score_changes.get(answer.author_id, 0) + delta
+        for author_id in answer_author_ids(answer):
+            for _ in answer.voted_by:
+                delta = FOOLED_BASE * multiplier
+                game.players[author_id].score += delta
+                score_changes[author_id] = score_changes.get(author_id, 0) + delta
 
     turn.score_changes = score_changes
 
@@ -401,9 +545,11 @@ def _apply_appeal_scores(game: GameState, appeal: Appeal) -> None:
             delta = CORRECT_GUESS_BASE * multiplier
             game.players[voter_id].score += delta
             turn.score_changes[voter_id] = turn.score_changes.get(voter_id, 0) + delta
-        # Author gets fooled points for each voter
-        if appealed_answer.author_id and appealed_answer.author_id in game.players:
-            author = game.players[appealed_answer.author_id]
+        # Authors get fooled points for each voter
+        for author_id in answer_author_ids(appealed_answer):
+            if author_id not in game.players:
+                continue
+            author = game.players[author_id]
             for _ in appealed_answer.voted_by:
                 delta = FOOLED_BASE * multiplier
                 author.score += delta
@@ -464,14 +610,44 @@ def advance_turn(game: GameState) -> str:
 # ---------------------------------------------------------------------------
 
 def sanitize_state(game: GameState) -> dict:
+    """Public view of the game, cached until the next mutation.
+
+    The returned dict is shared between callers and must not be modified.
+    """
+    version = game.mutation_version
+    cached = game.sanitized_cache
+    if cached and cached[0] == version:
+        return cached[1]
+    state = _build_sanitized_state(game)
+    # Odd versions mean a mutation is in flight; never cache a half-done state.
+    if version % 2 == 0 and game.mutation_version == version:
+        game.sanitized_cache = (version, state, None)
+    return state
+
+
+def sanitized_state_json(game: GameState) -> bytes:
+    version = game.mutation_version
+    cached = game.sanitized_cache
+    if cached and cached[0] == version and cached[2] is not None:
+        return cached[2]
+    state = sanitize_state(game)
+    body = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    if version % 2 == 0 and game.mutation_version == version:
+        game.sanitized_cache = (version, state, body)
+    return body
+
+
+def _build_sanitized_state(game: GameState) -> dict:
     rnd = game.current_round
     turn = rnd.current_turn if rnd else None
+    picker = current_picker(game)
 
     base = {
+        "room_code": game.room_code,
         "phase": game.phase,
         "players": [_player_public(p) for p in (game.players[pid] for pid in game.player_order if pid in game.players)],
-        "player_order": game.player_order,
-        "active_player_id": current_picker(game).player_id if current_picker(game) else None,
+        "player_order": list(game.player_order),
+        "active_player_id": picker.player_id if picker else None,
         "phase_deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None,
     }
 
@@ -515,8 +691,9 @@ def _sanitize_turn(game: GameState, turn: Turn) -> dict:
             {
                 "answer_id": a.answer_id,
                 "text": a.text,
-                "normalized_text": normalize_answer_text(a.text),
+                "normalized_text": a.normalized_text,
                 "author_id": a.author_id,
+                "author_ids": answer_author_ids(a),
             }
             for a in turn.answers
         ]
@@ -529,7 +706,7 @@ def _sanitize_turn(game: GameState, turn: Turn) -> dict:
     elif phase in ("round_results", "appeal_vote", "game_over"):
         d["real_answer_text"] = turn.real_answer_text
         d["answers"] = [_answer_revealed(game, a) for a in turn.answers]
-        d["score_changes"] = turn.score_changes
+        d["score_changes"] = dict(turn.score_changes)
         if phase == "appeal_vote":
             eligible = _eligible_appeal_voters(game)
             d["appeals"] = [_appeal_public(a, eligible) for a in turn.appeals]
@@ -539,12 +716,15 @@ def _sanitize_turn(game: GameState, turn: Turn) -> dict:
 
 def _answer_revealed(game: GameState, answer: Answer) -> dict:
     author = game.players.get(answer.author_id) if answer.author_id else None
+    author_ids = answer_author_ids(answer)
     return {
         "answer_id": answer.answer_id,
         "text": answer.text,
-        "normalized_text": normalize_answer_text(answer.text),
+        "normalized_text": answer.normalized_text,
         "author_id": answer.author_id,
+        "author_ids": author_ids,
         "author_name": author.name if author else None,
+        "author_names": [game.players[pid].name for pid in author_ids if pid in game.players],
         "is_real": answer.is_real,
         "is_bot": answer.is_bot,
         "vote_count": answer.vote_count,
@@ -559,8 +739,8 @@ def _appeal_public(appeal: Appeal, eligible: set[str]) -> dict:
         "answer_id": appeal.answer_id,
         "filed_by": appeal.filed_by,
         "eligible_voters": list(eligible),
-        "votes_accept": appeal.votes_accept,
-        "votes_reject": appeal.votes_reject,
+        "votes_accept": list(appeal.votes_accept),
+        "votes_reject": list(appeal.votes_reject),
         "resolved": appeal.resolved,
         "approved": appeal.approved,
     }
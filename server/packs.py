@@ -0,0 +1,150 @@
+"""
+Question packs.
+
+A pack is a file of questions in one of three formats, picked by extension:
+
+- ``.json``: an array of objects, as in data/seed.json
+- ``.ndjson`` / ``.jsonl``: one such object per line
+- ``.csv``: a header row with ``category``, ``question``, ``answer`` and
+  optionally ``group`` and ``lies`` (lies separated by ``|``)
+
+Every format is read incrementally, so a pack of any size is imported with
+flat memory use. Run ``python -m server.packs <file>...`` to add packs to the
+question database; re-importing a pack only writes what changed.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import logging
+from pathlib import Path
+from typing import IO, Iterator
+
+CSV_LIE_SEPARATOR = "|"
+_READ_CHUNK = 1 << 16
+
+
+def read_pack(path: Path) -> Iterator[dict]:
+    """Yield the pack's questions as dicts with category, question, answer, group and lies."""
+    suffix = path.suffix.lower()
+    # utf-8-sig drops the byte order mark that Excel and Sheets put at the
+    # start of exported files, which would otherwise stick to the first header.
+    with open(path, "r", encoding="utf-8-sig", newline="" if suffix == ".csv" else None) as f:
+        if suffix == ".json":
+            raw_entries = _iter_json_array(f)
+        elif suffix in (".ndjson", ".jsonl"):
+            raw_entries = (json.loads(line) for line in f if line.strip())
+        elif suffix == ".csv":
+            raw_entries = _iter_csv(f)
+        else:
+            raise ValueError(f"Unsupported pack format: {path.name}")
+        for number, raw in enumerate(raw_entries, start=1):
+            yield _pack_entry(raw, f"{path.name} entry {number}")
+
+
+def _pack_entry(raw: object, where: str) -> dict:
+    if not isinstance(raw, dict):
+        raise ValueError(f"{where}: expected an object")
+    entry = {}
+    for key in ("category", "question", "answer"):
+        value = raw.get(key)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"{where}: missing {key!r}")
+        entry[key] = value.strip()
+    group = raw.get("group")
+    if group is not None and not isinstance(group, str):
+        raise ValueError(f"{where}: 'group' must be text")
+    entry["group"] = (group or "").strip() or None
+    lies = raw.get("lies")
+    if lies is None:
+        lies = []
+    if not isinstance(lies, list) or not all(isinstance(lie, str) for lie in lies):
+        raise ValueError(f"{where}: 'lies' must be a list of text")
+    entry["lies"] = [lie.strip() for lie in lies if lie.strip()]
+    return entry
+
+
+def _iter_json_array(f: IO[str], chunk_size: int = _READ_CHUNK) -> Iterator[object]:
+    """Decode a top-level JSON array one element at a time."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def read_more() -> None:
+        # Drop what has been decoded and append the next chunk.
+        nonlocal buf, pos, eof
+        more = f.read(chunk_size)
+        eof = not more
+        buf = buf[pos:] + more
+        pos = 0
+
+    def next_char() -> str:
+        """The next non-whitespace character, or "" at the end of the input."""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if eof:
+                return ""
+            read_more()
+
+    if next_char() != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+    if next_char() == "]":
+        return
+    while True:
+        char = next_char()
+        if char in ",]":  # also "" at the end of the input
+            raise ValueError("Expected an array element" if char else "Unterminated JSON array")
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # A value running up to the end of the buffer, such as a
+                # number, may continue in the next chunk.
+                if end < len(buf) or eof:
+                    break
+            read_more()
+        pos = end
+        yield value
+        char = next_char()
+        if char == "]":
+            return
+        if char != ",":
+            raise ValueError("Expected ',' or ']' after an array element" if char else "Unterminated JSON array")
+        pos += 1
+
+
+def _iter_csv(f: IO[str]) -> Iterator[dict]:
+    for row in csv.DictReader(f):
+        row["lies"] = (row.get("lies") or "").split(CSV_LIE_SEPARATOR)
+        yield row
+
+
+def main() -> None:
+    from server.db import import_questions, init_db
+
+    parser = argparse.ArgumentParser(description="Add question packs to the question database.")
+    parser.add_argument("packs", nargs="+", type=Path)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    init_db()
+    for path in args.packs:
+        stats = import_questions(read_pack(path))
+        print(
+            f"{path.name}: {stats.read} read, {stats.inserted} added, {stats.updated} updated, "
+            f"{stats.unchanged} unchanged in {stats.seconds:.2f}s ({stats.rows_per_second:,.0f} rows/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+In-memory question index.
+
+The catalog (question id, category and group) is loaded from SQLite once and
+kept as one bitset per category, bit ``i`` standing for ``ids[i]``. Each room
+keeps a ``QuestionPool`` of the bits it has not used yet, so picking a
+question, or finding any category with questions left, never issues a query;
+only the chosen question's text and lies are read from the database.
+
+Category and group listings with their question counts are derived from the
+same bitsets and memoized per ``included_groups`` selection. Everything is
+rebuilt when ``db.catalog_version()`` moves, i.e. after an import.
+
+With ``QUESTION_PACK`` set, questions are served from that compiled pack
+(see server.compiled_pack) instead of SQLite, and only usage counts are
+written back to the database, and question search is unavailable.
+"""
+from __future__ import annotations
+
+import os
+import random
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from server import db
+from server.compiled_pack import CompiledPack
+
+QUESTION_PACK = os.environ.get("QUESTION_PACK")
+
+UNSEEN_WEIGHT = 3.0
+_MAX_CACHED_SELECTIONS = 64
+
+
+@dataclass
+class _CategoryIndex:
+    ids: list[int] = field(default_factory=list)
+    group_bits: dict[Optional[str], int] = field(default_factory=dict)
+
+    @property
+    def all_bits(self) -> int:
+        return (1 << len(self.ids)) - 1
+
+
+class QuestionIndex:
+    def __init__(
+        self,
+        rows: list[tuple[int, int, Optional[str]]],
+        version: int,
+        category_names: Optional[list[tuple[int, str]]] = None,
+    ):
+        self.version = version
+        self.categories: dict[int, _CategoryIndex] = {}
+        self.positions: dict[int, tuple[int, int]] = {}  # question_id → (category_id, bit)
+        group_counts: dict[Optional[str], int] = {}
+        for question_id, category_id, group_name in rows:
+            cat = self.categories.setdefault(category_id, _CategoryIndex())
+            bit = len(cat.ids)
+            cat.ids.append(question_id)
+            cat.group_bits[group_name] = cat.group_bits.get(group_name, 0) | (1 << bit)
+            self.positions[question_id] = (category_id, bit)
+            group_counts[group_name] = group_counts.get(group_name, 0) + 1
+
+        if category_names is None:
+            category_names = [(cid, str(cid)) for cid in sorted(self.categories)]
+        self.category_names = category_names
+        # Same order as SQL's ORDER BY group_name: NULL first, then by name.
+        self.groups = [
+            {"name": "Ungrouped" if name is None else name, "question_count": count}
+            for name, count in sorted(group_counts.items(), key=lambda item: (item[0] is not None, item[0] or ""))
+        ]
+        self._category_lists: dict[Optional[tuple[str, ...]], list[dict]] = {}
+
+    def category_list(self, included_groups: Optional[list[str]]) -> list[dict]:
+        """Categories with at least one playable question, sorted by name."""
+        key = None if included_groups is None else tuple(sorted(set(included_groups)))
+        cached = self._category_lists.get(key)
+        if cached is None:
+            cached = []
+            for category_id, name in self.category_names:
+                count = _popcount(self.eligible_bits(category_id, included_groups))
+                if count:
+                    cached.append({"id": category_id, "name": name, "question_count": count})
+            if len(self._category_lists) < _MAX_CACHED_SELECTIONS:
+                self._category_lists[key] = cached
+        return cached
+
+    def eligible_bits(self, category_id: int, included_groups: Optional[list[str]]) -> int:
+        cat = self.categories.get(category_id)
+        if cat is None:
+            return 0
+        if included_groups is None:
+            return cat.all_bits
+        bits = cat.group_bits.get(None, 0)  # ungrouped questions are always in play
+        for group in included_groups:
+            bits |= cat.group_bits.get(group, 0)
+        return bits
+
+
+class QuestionPool:
+    """One room's remaining questions. Mutated only under the room's lock."""
+
+    def __init__(self, index: QuestionIndex, included_groups: Optional[list[str]], used_ids: set[int]):
+        self.index = index
+        self.remaining: dict[int, int] = {}
+        for category_id in index.categories:
+            bits = index.eligible_bits(category_id, included_groups)
+            if bits:
+                self.remaining[category_id] = bits
+        for question_id in used_ids:
+            self._discard(question_id)
+
+    def take(self, category_id: int, histories: list[dict[str, str]]) -> Optional[int]:
+        bits = self.remaining.get(category_id, 0)
+        if not bits:
+            return None
+        cat = self.index.categories[category_id]
+
+        # Questions some player has already seen carry their own weight;
+        # every other remaining question weighs UNSEEN_WEIGHT.
+        seen: dict[int, float] = {}
+        for history in histories:
+            for key in history:
+                position = self._position(key)
+                if position and position[0] == category_id and bits >> position[1] & 1:
+                    seen.setdefault(cat.ids[position[1]], question_weight(key, histories))
+        seen_bits = 0
+        for question_id in seen:
+            seen_bits |= 1 << self.index.positions[question_id][1]
+        unseen_bits = bits & ~seen_bits
+        unseen_total = UNSEEN_WEIGHT * _popcount(unseen_bits)
+
+        if random.random() * (unseen_total + sum(seen.values())) < unseen_total:
+            question_id = cat.ids[_random_bit(unseen_bits)]
+        else:
+            question_id = random.choices(list(seen), weights=list(seen.values()), k=1)[0]
+        self._discard(question_id)
+        return question_id
+
+    def categories_left(self) -> list[int]:
+        return list(self.remaining)
+
+    def _position(self, key: str) -> Optional[tuple[int, int]]:
+        try:
+            return self.index.positions.get(int(key))
+        except ValueError:
+            return None
+
+    def _discard(self, question_id: int) -> None:
+        position = self.index.positions.get(question_id)
+        if position is None:
+            return
+        category_id, bit = position
+        bits = self.remaining.get(category_id, 0) & ~(1 << bit)
+        if bits:
+            self.remaining[category_id] = bits
+        else:
+            self.remaining.pop(category_id, None)
+
+
+def question_weight(question_id: int | str, player_histories: list[dict[str, str]]) -> float:
+    qid = str(question_id)
+    wrong = sum(1 for h in player_histories if h.get(qid) == "incorrect")
+    seen_correct = sum(1 for h in player_histories if h.get(qid) == "correct")
+    total_seen = wrong + seen_correct
+
+    if total_seen == 0:
+        return UNSEEN_WEIGHT
+    if wrong > 0:
+        return 2.0 + (wrong / max(total_seen, 1))
+    return 1.0
+
+
+def _popcount(bits: int) -> int:
+    return bin(bits).count("1")
+
+
+def _random_bit(bits: int) -> int:
+    """Index of a uniformly chosen set bit of ``bits`` (which must be non-zero)."""
+    width = bits.bit_length()
+    count = _popcount(bits)
+    if count * 4 >= width:
+        # Dense enough that rejection sampling needs under four tries on average.
+        while True:
+            bit = random.randrange(width)
+            if bits >> bit & 1:
+                return bit
+    for _ in range(random.randrange(count)):
+        bits &= bits - 1  # clear the lowest set bit
+    return (bits & -bits).bit_length() - 1
+
+
+# ---------------------------------------------------------------------------
+# Shared index and per-room pools
+# ---------------------------------------------------------------------------
+
+_index: Optional[QuestionIndex] = None
+_index_lock = threading.Lock()
+_pack: Optional[CompiledPack] = None
+_pack_generation = 0
+
+
+def use_compiled_pack(path: Optional[Path]) -> None:
+    """Serve questions from the pack at ``path``, or from SQLite again if None.
+
+    A replaced pack is left for the garbage collector to unmap, since another
+    thread may still be reading a question from it.
+    """
+    global _pack, _pack_generation
+    with _index_lock:
+        _pack = CompiledPack(path) if path is not None else None
+        _pack_generation += 1
+
+
+def _catalog_version() -> tuple:
+    if _pack is not None:
+        return ("pack", _pack_generation)
+    return ("db", db.catalog_version())
+
+
+def question_index() -> QuestionIndex:
+    global _index
+    index = _index
+    if index is not None and index.version == _catalog_version():
+        return index
+    with _index_lock:
+        version = _catalog_version()
+        if _index is None or _index.version != version:
+            if _pack is not None:
+                _index = QuestionIndex(_pack.catalog(), version, _pack.category_names())
+            else:
+                _index = QuestionIndex(db.get_question_catalog(), version, db.get_category_names())
+        return _index
+
+
+def get_question(question_id: int) -> Optional[dict]:
+    pack = _pack
+    return pack.question(question_id) if pack is not None else db.get_question(question_id)
+
+
+def mark_questions_used(question_ids: list[int]) -> None:
+    pack = _pack
+    if pack is None or pack.ids_from_db:
+        db.mark_questions_used(question_ids)
+
+
+def search_questions(**filters) -> Optional[tuple[list[dict], Optional[int]]]:
+    """db.search_questions, or None while serving a compiled pack, which has no search index."""
+    if _pack is not None:
+        return None
+    return db.search_questions(**filters)
+
+
+def get_categories(included_groups: Optional[list[str]] = None) -> list[dict]:
+    """Playable categories for a group selection. The result is shared; don't mutate it."""
+    return question_index().category_list(included_groups)
+
+
+def get_groups() -> list[dict]:
+    return question_index().groups
+
+
+def _room_pool(game) -> QuestionPool:
+    index = question_index()
+    pool = game.question_pool
+    if pool is None or pool.index is not index:
+        pool = game.question_pool = QuestionPool(index, game.included_groups, game.used_question_ids)
+    return pool
+
+
+def pick_question(game, category_id: int, histories: list[dict[str, str]]) -> Optional[dict]:
+    """Take a question from ``category_id`` that the room has not used yet."""
+    question_id = _room_pool(game).take(category_id, histories)
+    return get_question(question_id) if question_id is not None else None
+
+
+def pick_any_question(game, histories: list[dict[str, str]]) -> Optional[dict]:
+    """Take a question from a random category that still has some left."""
+    pool = _room_pool(game)
+    categories = pool.categories_left()
+    if not categories:
+        return None
+    question_id = pool.take(random.choice(categories), histories)
+    return get_question(question_id) if question_id is not None else None
@@ -1,21 +1,27 @@
 from __future__ import annotations
+import logging
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, g, jsonify, request
 
-from server import game_state_lock, socketio
+from server import socketio
 from server.game import (
+    DEFAULT_ROOM_CODE,
     GameState,
+    Turn,
     active_players,
     advance_turn,
     all_appeal_votes_done,
     all_likes_done,
     all_votes_cast,
     all_lies_submitted,
+    answer_author_ids,
     cast_appeal_vote,
     cast_like,
     cast_vote,
     compute_scores,
+    create_room,
     file_appeal,
     finalize_answers,
     finalize_likes,
@@ -25,30 +31,56 @@ from server.game import (
     reset_game,
     resolve_all_pending_appeals,
     sanitize_state,
+    sanitized_state_json,
     setup_turn,
     start_game,
     submit_lie,
     current_picker,
     _eligible_appeal_voters,
 )
-from server.db import (
+from server.embeddings import PreparedText, is_too_similar, prime_embedding
+from server.events import main_room, player_room, room_audience
+from server.db import MAX_SEARCH_PAGE_SIZE, SEARCH_PAGE_SIZE
+from server.questions import (
     get_categories,
     get_groups,
-    get_random_question,
     mark_questions_used,
+    pick_any_question,
+    pick_question,
+    search_questions,
 )
-from server.embeddings import is_too_similar
-from server.timers import set_phase_deadline, start_phase_timer
+from server.sync import broadcast_state
+from server.timers import cancel_phase_timer, set_phase_deadline, start_phase_timer
 
+LOGGER = logging.getLogger(__name__)
+
+# Registered twice by create_app(): once at /api for the default room and once
+# at /api/rooms/<room_code> so every endpoint can be scoped to a room.
 bp = Blueprint("api", __name__, url_prefix="/api")
+rooms_bp = Blueprint("rooms", __name__, url_prefix="/api/rooms")
 
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
+@bp.url_value_preprocessor
+def _pull_room_code(endpoint, values):
+    g.room_code = (values or {}).pop("room_code", DEFAULT_ROOM_CODE).upper()
+
+
+@bp.before_request
+def _require_room():
+    if get_game(g.room_code) is None:
+        return _error("Room not found", 404)
+
+
+def _current_game() -> GameState:
+    return get_game(g.room_code)
+
+
 def _emit_state(game: GameState) -> None:
-    socketio.emit("game_state", sanitize_state(game))
+    broadcast_state(game, to=room_audience(game.room_code))
 
 
 def _error(msg: str, code: int = 400):
@@ -59,30 +91,31 @@ def _stop_phase_clock(game: GameState) -> None:
     stopped_phase = game.phase
     game.phase_deadline = None
     game.phase_token += 1
-    socketio.emit("timer_stop", {"phase": stopped_phase})
+    cancel_phase_timer(game)
+    socketio.emit("timer_stop", {"phase": stopped_phase}, to=room_audience(game.room_code))
 
 
 def _advance_to_voting(game: GameState) -> None:
     finalize_answers(game)
     set_phase_deadline(game, "voting")
-    socketio.emit("phase_change", {"phase": "voting", "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None})
+    socketio.emit("phase_change", {"phase": "voting", "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None}, to=room_audience(game.room_code))
     start_phase_timer(game, lambda: _force_advance_voting(game))
     _emit_state(game)
 
 
 def _force_advance_voting(game: GameState) -> None:
-    with game_state_lock:
+    with game.lock:
         if game.phase != "voting":
             return
         finalize_votes(game)
         set_phase_deadline(game, "likes")
-        socketio.emit("phase_change", {"phase": "likes", "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None})
+        socketio.emit("phase_change", {"phase": "likes", "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None}, to=room_audience(game.room_code))
         start_phase_timer(game, lambda: _force_advance_likes(game))
     _emit_state(game)
 
 
 def _force_advance_likes(game: GameState) -> None:
-    with game_state_lock:
+    with game.lock:
         if game.phase != "likes":
             return
         # Mark all still-active players as done
@@ -90,14 +123,14 @@ def _force_advance_likes(game: GameState) -> None:
             p.has_liked = True
         finalize_likes(game)
         set_phase_deadline(game, "round_results")
-        socketio.emit("phase_change", {"phase": "round_results", "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None})
-        socketio.emit("round_results", sanitize_state(game)["current_turn"])
+        socketio.emit("phase_change", {"phase": "round_results", "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None}, to=room_audience(game.room_code))
+        socketio.emit("round_results", sanitize_state(game)["current_turn"], to=main_room(game.room_code))
         start_phase_timer(game, lambda: _force_advance_results(game))
     _emit_state(game)
 
 
 def _force_advance_results(game: GameState) -> None:
-    with game_state_lock:
+    with game.lock:
         if game.phase != "round_results":
             return
         turn = game.current_round.current_turn if game.current_round else None
@@ -105,7 +138,7 @@ def _force_advance_results(game: GameState) -> None:
             game.phase = "appeal_vote"
             game.phase_token += 1
             set_phase_deadline(game, "appeal_vote")
-            socketio.emit("phase_change", {"phase": "appeal_vote", "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None})
+            socketio.emit("phase_change", {"phase": "appeal_vote", "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None}, to=room_audience(game.room_code))
             start_phase_timer(game, lambda: _force_advance_appeal_vote(game))
         else:
             _do_advance_turn(game)
@@ -113,7 +146,7 @@ def _force_advance_results(game: GameState) -> None:
 
 
 def _force_advance_appeal_vote(game: GameState) -> None:
-    with game_state_lock:
+    with game.lock:
         if game.phase != "appeal_vote":
             return
         resolve_all_pending_appeals(game)
@@ -122,6 +155,7 @@ def _force_advance_appeal_vote(game: GameState) -> None:
 
 
 def _do_advance_turn(game: GameState) -> None:
+    cancel_phase_timer(game)
     turn = game.current_round.current_turn if game.current_round else None
     if turn:
         mark_questions_used([turn.question_id] if turn.question_id else [])
@@ -129,11 +163,11 @@ def _do_advance_turn(game: GameState) -> None:
     if next_phase != "game_over":
         set_phase_deadline(game, "category_pick")
         start_phase_timer(game, lambda: _force_advance_category_pick(game))
-    socketio.emit("phase_change", {"phase": next_phase, "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None})
+    socketio.emit("phase_change", {"phase": next_phase, "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None}, to=room_audience(game.room_code))
 
 
 def _force_advance_category_pick(game: GameState) -> None:
-    with game_state_lock:
+    with game.lock:
         if game.phase != "category_pick":
             return
         cats = get_categories(game.included_groups)
@@ -147,19 +181,21 @@ def _force_advance_category_pick(game: GameState) -> None:
 
 def _do_setup_turn(game: GameState, category_id: int, category_name: str) -> None:
     histories = [p.question_history for p in active_players(game)]
-    q = get_random_question(category_id, game.used_question_ids, histories, game.included_groups)
+    q = pick_question(game, category_id, histories)
     if not q:
         # No questions left in category — pick a random one from any category
-        cats = get_categories(game.included_groups)
-        import random
-        for cat in random.sample(cats, len(cats)):
-            q = get_random_question(cat["id"], game.used_question_ids, histories, game.included_groups)
-            if q:
-                category_id = cat["id"]
-                category_name = cat["name"]
-                break
-    if not q:
-        return
+        q = pick_any_question(game, histories)
+        if not q:
+            return
+        category_id = q["category_id"]
+        category_name = q["category_name"]
+
+    prepared = None
+    if q.get("answer_normalized") is not None:
+        prepared = PreparedText(q["answer_normalized"], tuple((q["answer_tokens"] or "").split()))
+        if q["answer_embedding"] is not None:
+            # The lie check then only has to embed the lie.
+            prime_embedding(prepared.normalized, q["answer_embedding"], q["answer_embedding_model"])
 
     setup_turn(
         game,
@@ -169,12 +205,23 @@ def _do_setup_turn(game: GameState, category_id: int, category_name: str) -> Non
         question_prompt=q["prompt"],
         real_answer_text=q["answer"],
         bot_lies=q.get("lies", []),
+        real_answer_prepared=prepared,
     )
     set_phase_deadline(game, "lie_submission")
-    socketio.emit("phase_change", {"phase": "lie_submission", "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None})
+    socketio.emit("phase_change", {"phase": "lie_submission", "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None}, to=room_audience(game.room_code))
     start_phase_timer(game, lambda: _force_advance_voting(game))
 
 
+# ---------------------------------------------------------------------------
+# Rooms
+# ---------------------------------------------------------------------------
+
+@rooms_bp.route("", methods=["POST"])
+def create_room_route():
+    game = create_room()
+    return jsonify({"room_code": game.room_code, "state": sanitize_state(game)}), 201
+
+
 # ---------------------------------------------------------------------------
 # Player endpoints
 # ---------------------------------------------------------------------------
@@ -186,8 +233,8 @@ def join_game():
     if not name:
         return _error("name is required")
 
-    game = get_game()
-    with game_state_lock:
+    game = _current_game()
+    with game.lock:
         if game.phase != "lobby":
             return _error("Game already in progress", 403)
 
@@ -217,9 +264,9 @@ def join_game():
 def rejoin_game():
     data = request.get_json(force=True, silent=True) or {}
     player_id = data.get("player_id", "")
-    game = get_game()
+    game = _current_game()
 
-    with game_state_lock:
+    with game.lock:
         player = game.players.get(player_id)
         if not player:
             return _error("Player not found — join as a new player", 404)
@@ -236,8 +283,8 @@ def rejoin_game():
 @bp.route("/players/<player_id>", methods=["PATCH"])
 def update_player(player_id: str):
     data = request.get_json(force=True, silent=True) or {}
-    game = get_game()
-    with game_state_lock:
+    game = _current_game()
+    with game.lock:
         player = game.players.get(player_id)
         if not player:
             return _error("Player not found", 404)
@@ -265,8 +312,8 @@ def update_player(player_id: str):
 @bp.route("/game/start", methods=["POST"])
 def start():
     data = request.get_json(force=True, silent=True) or {}
-    game = get_game()
-    with game_state_lock:
+    game = _current_game()
+    with game.lock:
         if game.phase != "lobby":
             return _error("Game already started")
         active = active_players(game)
@@ -277,7 +324,7 @@ def start():
         start_game(game)
         set_phase_deadline(game, "category_pick")
         start_phase_timer(game, lambda: _force_advance_category_pick(game))
-        socketio.emit("phase_change", {"phase": "category_pick", "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None})
+        socketio.emit("phase_change", {"phase": "category_pick", "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None}, to=room_audience(game.room_code))
         state = sanitize_state(game)
 
     _emit_state(game)
@@ -286,24 +333,24 @@ def start():
 
 @bp.route("/game/state", methods=["GET"])
 def game_state():
-    game = get_game()
-    return jsonify(sanitize_state(game))
+    game = _current_game()
+    return Response(sanitized_state_json(game), mimetype="application/json")
 
 
 @bp.route("/game/reset", methods=["POST"])
 def game_reset():
-    game = reset_game()
+    game = reset_game(g.room_code)
     _emit_state(game)
     return jsonify({"status": "reset"})
 
 
 # ---------------------------------------------------------------------------
-# Categories / groups
+# Categories / groups / question bank
 # ---------------------------------------------------------------------------
 
 @bp.route("/categories", methods=["GET"])
 def categories():
-    game = get_game()
+    game = _current_game()
     cats = get_categories(game.included_groups)
     return jsonify(cats)
 
@@ -313,6 +360,36 @@ def groups():
     return jsonify(get_groups())
 
 
+@bp.route("/questions", methods=["GET"])
+def questions():
+    """Search or page through the question bank.
+
+    Query params: q (words to find in prompts and answers), category_id,
+    group (repeatable; "Ungrouped" for questions without one), after (the
+    next_after of the previous page) and limit.
+    """
+    numbers = {"category_id": None, "after": 0, "limit": SEARCH_PAGE_SIZE}
+    for name in numbers:
+        value = request.args.get(name)
+        if value is not None:
+            try:
+                numbers[name] = int(value)
+            except ValueError:
+                return _error(f"{name} must be a whole number")
+    group_names = request.args.getlist("group")
+    page = search_questions(
+        query=request.args.get("q") or None,
+        category_id=numbers["category_id"],
+        groups=[None if name == "Ungrouped" else name for name in group_names] if group_names else None,
+        after=numbers["after"],
+        limit=min(max(numbers["limit"], 1), MAX_SEARCH_PAGE_SIZE),
+    )
+    if page is None:
+        return _error("Question search is unavailable while serving a compiled pack", 503)
+    found, next_after = page
+    return jsonify({"questions": found, "next_after": next_after})
+
+
 # ---------------------------------------------------------------------------
 # Category pick
 # ---------------------------------------------------------------------------
@@ -322,9 +399,9 @@ def pick_category():
     data = request.get_json(force=True, silent=True) or {}
     player_id = data.get("player_id", "")
     category_id = data.get("category_id")
-    game = get_game()
+    game = _current_game()
 
-    with game_state_lock:
+    with game.lock:
         if game.phase != "category_pick":
             return _error("Not in category pick phase")
         picker = current_picker(game)
@@ -347,37 +424,71 @@ def pick_category():
 # Lie submission
 # ---------------------------------------------------------------------------
 
+# Similarity checks can wait on the embeddings endpoint for _EMBED_TIMEOUT, so
+# they run here instead of under the room lock, and the verdict reaches the
+# player as a "lie_result" socket event.
+LIE_VALIDATION_WORKERS = 8
+_lie_validation_pool = ThreadPoolExecutor(max_workers=LIE_VALIDATION_WORKERS, thread_name_prefix="lie-validation")
+
+
 @bp.route("/game/lie", methods=["POST"])
 def submit_lie_route():
     data = request.get_json(force=True, silent=True) or {}
     player_id = data.get("player_id", "")
     text = (data.get("text") or "").strip()
-    game = get_game()
+    game = _current_game()
 
-    with game_state_lock:
+    with game.lock:
         if game.phase != "lie_submission":
             return _error("Not in lie submission phase")
         player = game.players.get(player_id)
         if not player or not player.connected:
             return _error("Player not found", 404)
-        if player.has_submitted_lie:
+        turn = game.current_round.current_turn
+        if player.has_submitted_lie or player_id in turn.pending_lie_ids:
             return _error("Already submitted a lie")
         if not text:
             return _error("Lie text cannot be empty")
+        turn.pending_lie_ids.add(player_id)
 
-        turn = game.current_round.current_turn
-        if is_too_similar(text, turn.real_answer_text):
-            return _error("That's too close to the real answer — try again!")
+    _lie_validation_pool.submit(_validate_lie, game, turn, player_id, text)
+    return jsonify({"status": "validating"}), 202
 
-        submit_lie(game, player_id, text)
-        done = all_lies_submitted(game)
-        if done:
-            _stop_phase_clock(game)
-            _advance_to_voting(game)
 
-    if not done:
+def _validate_lie(game: GameState, turn: Turn, player_id: str, text: str) -> None:
+    # is_too_similar already falls back to text matching when embeddings
+    # fail, so an error here means the lie could not be checked at all; the
+    # player is asked to try again rather than have it accepted unchecked.
+    try:
+        too_similar = is_too_similar(text, turn.real_answer_text, turn.real_answer_prepared)
+    except Exception:
+        LOGGER.exception("Lie check failed lie=%r", text)
+        too_similar = None
+
+    with game.lock:
+        turn.pending_lie_ids.discard(player_id)
+        current = game.current_round.current_turn if game.current_round else None
+        player = game.players.get(player_id)
+        if game.phase != "lie_submission" or current is not turn or not player:
+            result = {"status": "expired", "error": "Lie submission has closed"}
+            done = None
+        elif too_similar is None:
+            result = {"status": "error", "error": "Couldn't check that lie — please try again."}
+            done = None
+        elif too_similar:
+            result = {"status": "rejected", "error": "That's too close to the real answer — try again!"}
+            done = None
+        else:
+            submit_lie(game, player_id, text)
+            result = {"status": "submitted"}
+            done = all_lies_submitted(game)
+            if done:
+                _stop_phase_clock(game)
+                _advance_to_voting(game)
+
+    socketio.emit("lie_result", result, to=player_room(game.room_code, player_id))
+    if done is False:
         _emit_state(game)
-    return jsonify({"status": "submitted"})
 
 
 # ---------------------------------------------------------------------------
@@ -389,12 +500,12 @@ def vote():
     data = request.get_json(force=True, silent=True) or {}
     player_id = data.get("player_id", "")
     answer_id = data.get("answer_id", "")
-    game = get_game()
+    game = _current_game()
 
     votes_done = False
     likes_done = False
 
-    with game_state_lock:
+    with game.lock:
         if game.phase != "voting":
             return _error("Not in voting phase")
         player = game.players.get(player_id)
@@ -407,7 +518,7 @@ def vote():
         answer = next((a for a in turn.answers if a.answer_id == answer_id), None)
         if not answer:
             return _error("Invalid answer_id")
-        if answer.author_id == player_id:
+        if player_id in answer_author_ids(answer):
             return _error("You cannot vote for your own lie")
 
         cast_vote(game, player_id, answer_id)
@@ -417,7 +528,7 @@ def vote():
             likes_done = all_likes_done(game)
             if not likes_done:
                 set_phase_deadline(game, "likes")
-                socketio.emit("phase_change", {"phase": "likes", "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None})
+                socketio.emit("phase_change", {"phase": "likes", "deadline_ts": game.phase_deadline.timestamp() if game.phase_deadline else None}, to=room_audience(game.room_code))
                 start_phase_timer(game, lambda: _force_advance_likes(game))
 
     if votes_done and likes_done:
@@ -437,9 +548,9 @@ def like():
     data = request.get_json(force=True, silent=True) or {}
     player_id = data.get("player_id", "")
     answer_id = data.get("answer_id", "")
-    game = get_game()
+    game = _current_game()
 
-    with game_state_lock:
+    with game.lock:
         if game.phase not in ("voting", "likes"):
             return _error("Not in a phase that allows likes")
         player = game.players.get(player_id)
@@ -454,7 +565,7 @@ def like():
         answer = next((a for a in turn.answers if a.answer_id == answer_id), None)
         if not answer:
             return _error("Invalid answer_id")
-        if answer.author_id == player_id:
+        if player_id in answer_author_ids(answer):
             return _error("You cannot like your own answer")
         if player_id in answer.liked_by:
             return _error("Already liked this answer")
@@ -463,7 +574,7 @@ def like():
         mark_likes_done(game, player_id)
         done = all_likes_done(game)
 
-    # _force_advance_likes acquires game_state_lock itself, so call after releasing
+    # _force_advance_likes acquires game.lock itself, so call after releasing
     if done:
         _force_advance_likes(game)
         return jsonify({"status": "liked"})
@@ -481,9 +592,9 @@ def appeal():
     data = request.get_json(force=True, silent=True) or {}
     player_id = data.get("player_id", "")
     answer_id = data.get("answer_id", "")
-    game = get_game()
+    game = _current_game()
 
-    with game_state_lock:
+    with game.lock:
         if game.phase != "round_results":
             return _error("Appeals can only be filed during round results")
         player = game.players.get(player_id)
@@ -511,9 +622,9 @@ def appeal_vote():
     player_id = data.get("player_id", "")
     appeal_id = data.get("appeal_id", "")
     accept = bool(data.get("accept", False))
-    game = get_game()
+    game = _current_game()
 
-    with game_state_lock:
+    with game.lock:
         if game.phase != "appeal_vote":
             return _error("Not in appeal vote phase")
         player = game.players.get(player_id)
@@ -550,7 +661,7 @@ def appeal_vote():
 
 @bp.route("/game/scores", methods=["GET"])
 def scores():
-    game = get_game()
+    game = _current_game()
     sorted_players = sorted(game.players.values(), key=lambda p: p.score, reverse=True)
     return jsonify([
         {
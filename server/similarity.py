@@ -0,0 +1,49 @@
+"""
+Vector similarity.
+
+Cosine similarity for one pair and the full pairwise matrix for a batch, done
+with NumPy, which requirements.txt installs. A plain-Python path gives the
+same results where NumPy is missing.
+"""
+from __future__ import annotations
+
+import math
+from typing import Sequence
+
+try:
+    import numpy as np
+except ImportError:  # fallback only; requirements.txt installs NumPy
+    np = None
+
+
+def cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    if np is not None:
+        va = np.asarray(a, dtype=np.float64)
+        vb = np.asarray(b, dtype=np.float64)
+        mag = float(np.linalg.norm(va) * np.linalg.norm(vb))
+        return float(va @ vb) / mag if mag else 0.0
+
+    dot = sum(x * y for x, y in zip(a, b))
+    mag_a = math.sqrt(sum(x * x for x in a))
+    mag_b = math.sqrt(sum(y * y for y in b))
+    if mag_a == 0 or mag_b == 0:
+        return 0.0
+    return dot / (mag_a * mag_b)
+
+
+def similarity_matrix(vectors: Sequence[Sequence[float]]) -> list[list[float]]:
+    """Pairwise cosine similarity of every vector against every other."""
+    if not vectors:
+        return []
+    if np is not None:
+        matrix = np.asarray(vectors, dtype=np.float64)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        unit = matrix / norms
+        return (unit @ unit.T).tolist()
+
+    units = []
+    for vector in vectors:
+        mag = math.sqrt(sum(x * x for x in vector)) or 1.0
+        units.append([x / mag for x in vector])
+    return [[sum(x * y for x, y in zip(u, v)) for v in units] for u in units]
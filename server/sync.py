@@ -0,0 +1,91 @@
+"""
+Versioned state sync.
+
+Every broadcast of a room's state bumps its ``state_version``. The first
+broadcast (and any resync) sends the full sanitized state as ``game_state``
+with a ``version`` key; after that only a ``state_patch`` is sent:
+
+    {"base_version": 5, "version": 6,
+     "ops": [{"op": "replace", "path": ["current_turn", "votes_received"], "value": 6}]}
+
+A client applies the patch only when ``base_version`` matches the version it
+holds, and otherwise emits ``resync`` to get a fresh full state.
+"""
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from server import socketio
+from server.game import GameState, sanitize_state
+
+
+def diff_state(old: Any, new: Any, path: tuple = ()) -> list[dict]:
+    if old is new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: list[dict] = []
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "replace", "path": [*path, key], "value": value})
+            else:
+                ops.extend(diff_state(old[key], value, (*path, key)))
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": [*path, key]})
+        return ops
+
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        ops = []
+        for i, (a, b) in enumerate(zip(old, new)):
+            ops.extend(diff_state(a, b, (*path, i)))
+        return ops
+
+    if old == new and type(old) is type(new):
+        return []
+    return [{"op": "replace", "path": list(path), "value": new}]
+
+
+def apply_patch(state: dict, ops: list[dict]) -> dict:
+    for op in ops:
+        target = state
+        *parents, last = op["path"]
+        for key in parents:
+            target = target[key]
+        if op["op"] == "remove":
+            del target[last]
+        else:
+            target[last] = op["value"]
+    return state
+
+
+def _sync(game: GameState) -> Optional[tuple[str, dict]]:
+    """Compare the current state with the last synced one; caller holds game.sync_lock."""
+    state = sanitize_state(game)
+    previous = game.synced_state
+    if previous is None:
+        game.state_version += 1
+        game.synced_state = state
+        return "game_state", {**state, "version": game.state_version}
+
+    ops = diff_state(previous, state)
+    if not ops:
+        return None
+    base_version = game.state_version
+    game.state_version += 1
+    game.synced_state = state
+    return "state_patch", {"base_version": base_version, "version": game.state_version, "ops": ops}
+
+
+def broadcast_state(game: GameState, to) -> None:
+    # Emitting under sync_lock keeps patches in version order on the wire.
+    with game.sync_lock:
+        message = _sync(game)
+        if message:
+            socketio.emit(*message, to=to)
+
+
+def full_state(game: GameState) -> dict:
+    with game.sync_lock:
+        if game.synced_state is None:
+            _sync(game)
+        return {**game.synced_state, "version": game.state_version}
@@ -1,8 +1,14 @@
 from __future__ import annotations
+import heapq
+import itertools
+import logging
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Callable
+from typing import Callable, Optional
+
+LOGGER = logging.getLogger(__name__)
 
 PHASE_TIMEOUTS: dict[str, int] = {
     "category_pick": 15,
@@ -13,6 +19,113 @@ PHASE_TIMEOUTS: dict[str, int] = {
     "appeal_vote": 15,
 }
 
+# Expired deadlines are handed to a few workers so one room waiting on its
+# lock cannot hold up deadlines in other rooms.
+TIMER_WORKERS = 4
+
+
+class TimerHandle:
+    __slots__ = ("when", "callback", "cancelled", "in_heap", "_scheduler")
+
+    def __init__(self, when: float, callback: Callable[[], None], scheduler: "PhaseScheduler"):
+        self.when = when
+        self.callback = callback
+        self.cancelled = False  # both flags are set under the scheduler's lock
+        self.in_heap = True
+        self._scheduler = scheduler
+
+    def cancel(self) -> None:
+        self._scheduler.cancel(self)
+
+
+class PhaseScheduler:
+    """One thread and a min-heap of deadlines for every room in the process.
+
+    Scheduling is O(log n). Cancelled handles stay in the heap until they
+    reach the top, or until they make up half of it and the heap is rebuilt.
+    """
+
+    def __init__(self, workers: int = TIMER_WORKERS):
+        self._heap: list[tuple[float, int, TimerHandle]] = []
+        self._counter = itertools.count()
+        self._cancelled = 0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._workers = workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> TimerHandle:
+        handle = TimerHandle(time.monotonic() + delay, callback, self)
+        with self._cond:
+            heapq.heappush(self._heap, (handle.when, next(self._counter), handle))
+            if self._thread is None:
+                self._pool = ThreadPoolExecutor(self._workers, thread_name_prefix="phase-timer")
+                self._thread = threading.Thread(target=self._run, name="phase-scheduler", daemon=True)
+                self._thread.start()
+            if self._heap[0][2] is handle:
+                self._cond.notify()
+        return handle
+
+    def cancel(self, handle: TimerHandle) -> None:
+        with self._cond:
+            if handle.cancelled:
+                return
+            handle.cancelled = True
+            # A handle that already fired has left the heap; only count
+            # cancelled entries still sitting in it.
+            if not handle.in_heap:
+                return
+            self._cancelled += 1
+            if self._cancelled > len(self._heap) // 2:
+                live = []
+                for entry in self._heap:
+                    if entry[2].cancelled:
+                        entry[2].in_heap = False
+                    else:
+                        live.append(entry)
+                self._heap = live
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap) - self._cancelled
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)[2].in_heap = False
+                        self._cancelled -= 1
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.monotonic()
+                    if delay <= 0:
+                        handle = heapq.heappop(self._heap)[2]
+                        handle.in_heap = False
+                        break
+                    self._cond.wait(delay)
+            self._pool.submit(self._fire, handle)
+
+    @staticmethod
+    def _fire(handle: TimerHandle) -> None:
+        if handle.cancelled:
+            return
+        try:
+            handle.callback()
+        except Exception:
+            LOGGER.exception("Phase timer callback failed")
+
+
+_scheduler = PhaseScheduler()
+
+
+def call_later(delay: float, callback: Callable[[], None]) -> TimerHandle:
+    """Run ``callback`` on the shared scheduler after ``delay`` seconds."""
+    return _scheduler.call_later(delay, callback)
+
 
 def set_phase_deadline(game, phase: str) -> None:
     seconds = PHASE_TIMEOUTS.get(phase, 0)
@@ -23,29 +136,23 @@ def set_phase_deadline(game, phase: str) -> None:
 
 
 def start_phase_timer(game, advance_fn: Callable[[], None]) -> None:
+    cancel_phase_timer(game)
     token = game.phase_token
     seconds = PHASE_TIMEOUTS.get(game.phase, 0)
     if seconds <= 0:
         return
 
     def _body():
-        time.sleep(seconds)
-        # advance_fn acquires game_state_lock internally; don't hold it here
+        # advance_fn acquires game.lock internally; don't hold it here
         if game.phase_token != token:
             return
         advance_fn()
 
-    threading.Thread(target=_body, daemon=True).start()
+    game.phase_timer = _scheduler.call_later(seconds, _body)
 
 
-def start_tick_loop(socketio) -> None:
-    def _tick():
-        while True:
-            time.sleep(1)
-            from server.game import get_game
-            game = get_game()
-            if game.phase_deadline:
-                remaining = (game.phase_deadline - datetime.now(timezone.utc)).total_seconds()
-                socketio.emit("timer_tick", {"seconds_remaining": max(0, int(remaining))})
-
-    threading.Thread(target=_tick, daemon=True).start()
+def cancel_phase_timer(game) -> None:
+    handle = game.phase_timer
+    if handle is not None:
+        game.phase_timer = None
+        handle.cancel()
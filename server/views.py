@@ -1,6 +1,8 @@
 import socket
 
-from flask import Blueprint, render_template
+from flask import Blueprint, abort, render_template
+
+from server.game import DEFAULT_ROOM_CODE, get_game
 
 bp = Blueprint("views", __name__)
 
@@ -16,15 +18,28 @@ def _local_ip() -> str:
         return "localhost"
 
 
+def _room_or_404(room_code: str) -> str:
+    room_code = room_code.upper()
+    if get_game(room_code) is None:
+        abort(404)
+    return room_code
+
+
 @bp.route("/main/")
-def main():
-    return render_template("main/index.html", local_ip=_local_ip())
+@bp.route("/main/<room_code>/")
+def main(room_code: str = DEFAULT_ROOM_CODE):
+    room_code = _room_or_404(room_code)
+    return render_template("main/index.html", local_ip=_local_ip(), room_code=room_code,
+                           is_default_room=room_code == DEFAULT_ROOM_CODE)
 
 
 @bp.route("/player/")
 @bp.route("/players/")
-def players():
-    return render_template("player/index.html")
+@bp.route("/players/<room_code>/")
+def players(room_code: str = DEFAULT_ROOM_CODE):
+    room_code = _room_or_404(room_code)
+    return render_template("player/index.html", room_code=room_code,
+                           is_default_room=room_code == DEFAULT_ROOM_CODE)
 
 
 @bp.route("/preview/")
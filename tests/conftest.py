@@ -14,6 +14,7 @@ from unittest.mock import patch
 import pytest
 import requests as _req
 
+import server.db as db_module
 import server.game as game_module
 import server.timers as timers_module
 
@@ -31,6 +32,34 @@ UI_TIMEOUTS = {k: 2.0 for k in [
 BASE_URL = "http://localhost:6767"
 
 
+@pytest.fixture(scope="module")
+def app():
+    """A Flask test app, shared by one module's tests."""
+    from server import create_app
+    application = create_app()
+    application.config["TESTING"] = True
+    return application
+
+
+@pytest.fixture()
+def client(app):
+    """A test client on a freshly reset default room."""
+    game_module.reset_game()
+    with app.test_client() as c:
+        yield c
+    game_module.reset_game()
+
+
+@pytest.fixture()
+def db(tmp_path, monkeypatch):
+    """server.db on a fresh database in a temporary directory."""
+    db_module.close_connections()
+    monkeypatch.setattr(db_module, "DB_PATH", tmp_path / "questions.db")
+    db_module.init_db()
+    yield db_module
+    db_module.close_connections()
+
+
 @pytest.fixture(scope="session")
 def live_server():
     """Start a real Flask+SocketIO server that Playwright (and requests) can reach."""
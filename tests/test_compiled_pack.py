@@ -0,0 +1,126 @@
+"""
+Compiled, memory-mapped question packs.
+
+Run with:  pytest tests/test_compiled_pack.py -v
+"""
+from __future__ import annotations
+
+import json
+from array import array
+from unittest.mock import patch
+
+import pytest
+
+import server.db as db_module
+import server.game as game_module
+import server.questions as questions_module
+from server.compiled_pack import CompiledPack, PackFormatError, _questions_from_packs, compile_pack
+
+
+@pytest.fixture()
+def compiled(db, tmp_path):
+    question_id = db.get_question_catalog()[0][0]
+    with db._connection() as conn:
+        conn.execute(
+            "UPDATE questions SET answer_embedding = ?, answer_embedding_model = 'test-model' WHERE id = ?",
+            (array("f", [0.25, -1.5, 3.0]).tobytes(), question_id),
+        )
+        conn.commit()
+    path = tmp_path / "questions.lapack"
+    assert compile_pack(db.iter_questions(), path, ids_from_db=True) == 40
+    pack = CompiledPack(path)
+    yield pack
+    pack.close()
+
+
+def test_pack_matches_the_database(db, compiled):
+    assert compiled.ids_from_db
+    assert compiled.catalog() == sorted(db.get_question_catalog())
+    assert compiled.category_names() == db.get_category_names()
+    for question_id, _, _ in db.get_question_catalog():
+        expected = db.get_question(question_id)
+        actual = compiled.question(question_id)
+        assert sorted(actual.pop("lies")) == sorted(expected.pop("lies"))
+        expected["last_used_at"] = None
+        assert actual == expected
+    assert compiled.question(10_000) is None
+    assert compiled.question(0) is None
+
+
+def test_embeddings_survive_compilation(db, compiled):
+    question = compiled.question(db.get_question_catalog()[0][0])
+    assert question["answer_embedding"] == array("f", [0.25, -1.5, 3.0])
+    assert question["answer_embedding_model"] == "test-model"
+
+
+def test_pack_compiles_from_pack_files(tmp_path):
+    source = tmp_path / "pack.json"
+    source.write_text(json.dumps([
+        {"category": "History", "question": "Who?", "answer": "Joan of Arc", "lies": ["Boudica"], "group": "people"},
+        {"category": "Geography", "question": "Where?", "answer": "Canberra", "lies": []},
+        {"category": "History", "question": "When?", "answer": "nineteen forty-five", "lies": ["1944"]},
+    ]))
+    path = tmp_path / "out.lapack"
+    assert compile_pack(_questions_from_packs([source]), path) == 3
+    pack = CompiledPack(path)
+    try:
+        assert not pack.ids_from_db
+        assert pack.catalog() == [(1, 1, "people"), (2, 2, None), (3, 1, None)]
+        assert pack.category_names() == [(2, "Geography"), (1, "History")]
+        question = pack.question(3)
+        assert (question["prompt"], question["answer_normalized"], question["lies"]) == ("When?", "1945", ["1944"])
+        assert question["answer_embedding"] is None
+    finally:
+        pack.close()
+
+
+def test_rooms_are_served_from_the_pack(db, compiled, monkeypatch):
+    monkeypatch.setattr(questions_module, "_pack", None)
+    questions_module.use_compiled_pack(compiled.path)
+    game = game_module.reset_game()
+    try:
+        with patch.object(db_module, "get_question") as db_lookup:
+            category = questions_module.get_categories()[0]
+            question = questions_module.pick_question(game, category["id"], [])
+        db_lookup.assert_not_called()
+        assert question["category_id"] == category["id"]
+
+        questions_module.mark_questions_used([question["id"]])
+        assert db.flush_writes(timeout=5)
+        assert db.get_question(question["id"])["last_used_at"] is not None
+    finally:
+        questions_module.use_compiled_pack(None)
+        game_module.reset_game()
+
+
+def test_usage_is_not_recorded_for_packs_without_database_ids(tmp_path, monkeypatch):
+    source = tmp_path / "pack.ndjson"
+    source.write_text(json.dumps({"category": "History", "question": "Who?", "answer": "Joan of Arc"}) + "\n")
+    path = tmp_path / "out.lapack"
+    compile_pack(_questions_from_packs([source]), path)
+    monkeypatch.setattr(questions_module, "_pack", None)
+    questions_module.use_compiled_pack(path)
+    try:
+        with patch.object(db_module, "mark_questions_used") as mark:
+            questions_module.mark_questions_used([1])
+        mark.assert_not_called()
+    finally:
+        questions_module.use_compiled_pack(None)
+
+
+def test_search_is_unavailable_while_serving_a_pack(db, compiled, monkeypatch):
+    monkeypatch.setattr(questions_module, "_pack", None)
+    questions_module.use_compiled_pack(compiled.path)
+    try:
+        assert questions_module.search_questions(query="washington") is None
+    finally:
+        questions_module.use_compiled_pack(None)
+    assert questions_module.search_questions(query="washington")[0]
+
+
+@pytest.mark.parametrize("content", [b"", b"not a pack at all, just some bytes" * 4])
+def test_other_files_are_rejected(tmp_path, content):
+    path = tmp_path / "bad.lapack"
+    path.write_bytes(content)
+    with pytest.raises(PackFormatError):
+        CompiledPack(path)
@@ -0,0 +1,403 @@
+"""
+Question database access through the pooled SQLite connections.
+
+Run with:  pytest tests/test_db.py -v
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from array import array
+
+import pytest
+
+import server.db as db_module
+from server.embeddings import EMBEDDING_MODEL, prepare_text
+
+
+def _category(db, name: str) -> dict:
+    return next({"id": cid, "name": cname} for cid, cname in db.get_category_names() if cname == name)
+
+
+def _question_ids(db, category_id: int) -> list[int]:
+    with db._connection() as conn:
+        rows = conn.execute("SELECT id FROM questions WHERE category_id = ?", (category_id,)).fetchall()
+    return [r["id"] for r in rows]
+
+
+def test_connections_are_reused_between_calls(db):
+    db.get_category_names()
+    conn = db._pool.queue[-1]
+    db.get_question_catalog()
+    db.get_category_names()
+    assert db._pool.qsize() == 1
+    assert db._pool.queue[-1] is conn
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+
+def test_concurrent_borrowers_get_separate_connections(db):
+    with db._connection() as first, db._connection() as second:
+        assert first is not second
+    assert db._pool.qsize() == 2
+
+
+def test_question_catalog_and_lookup(db):
+    category = _category(db, "History")
+    catalog = db.get_question_catalog()
+    assert len(catalog) == 40
+    question_id, category_id, group_name = next(row for row in catalog if row[1] == category["id"])
+
+    question = db.get_question(question_id)
+    assert question["category_id"] == category_id
+    assert question["category_name"] == "History"
+    assert question["group_name"] == group_name
+    assert question["prompt"] and question["answer"] and question["lies"]
+    assert db.get_question(10**9) is None
+
+
+def test_mark_questions_used_updates_every_id(db):
+    category = _category(db, "History")
+    ids = _question_ids(db, category["id"])[:2]
+    db.mark_questions_used(ids)
+    db.mark_questions_used(ids[:1])
+    assert db.flush_writes(timeout=5)
+
+    with db._connection() as conn:
+        rows = conn.execute(
+            "SELECT id, used_count, last_used_at FROM questions WHERE id IN (?, ?) ORDER BY id", ids
+        ).fetchall()
+    assert [r["used_count"] for r in rows] == [2, 1]
+    assert all(r["last_used_at"] for r in rows)
+
+
+def test_seeded_answers_carry_normalized_text_and_tokens(db):
+    question_id = db.get_question_catalog()[0][0]
+    question = db.get_question(question_id)
+    prepared = prepare_text(question["answer"])
+    assert question["answer_normalized"] == prepared.normalized
+    assert tuple(question["answer_tokens"].split()) == prepared.tokens
+    assert question["answer_embedding"] is None
+
+
+def test_backfill_stores_answer_embeddings(db, monkeypatch):
+    requested = []
+
+    def fake_embed(texts):
+        requested.append(list(texts))
+        return [array("f", [float(len(text)), 1.0]) for text in texts]
+
+    monkeypatch.setattr(db_module, "embed_texts", fake_embed)
+    with db._connection() as conn:
+        conn.execute("UPDATE questions SET answer_normalized = NULL, answer_tokens = NULL")
+        conn.commit()
+
+    assert db.backfill_answer_features(batch_size=16) == 40
+    assert [len(batch) for batch in requested] == [16, 16, 8]
+    question = db.get_question(db.get_question_catalog()[0][0])
+    assert question["answer_normalized"] == prepare_text(question["answer"]).normalized
+    assert list(question["answer_embedding"]) == [float(len(question["answer_normalized"])), 1.0]
+    assert question["answer_embedding_model"] == EMBEDDING_MODEL
+    assert db.backfill_answer_features() == 0
+
+
+def test_backfill_pauses_when_embeddings_are_unavailable(db, monkeypatch):
+    def unavailable(texts):
+        raise RuntimeError("LM Studio unavailable")
+
+    monkeypatch.setattr(db_module, "embed_texts", unavailable)
+    assert db.backfill_answer_features() == 0
+    assert db.get_question(db.get_question_catalog()[0][0])["answer_embedding"] is None
+
+
+def test_backfill_stops_when_the_backend_returns_too_few_vectors(db, monkeypatch):
+    monkeypatch.setattr(db_module, "embed_texts", lambda texts: [array("f", [1.0])] * (len(texts) - 1))
+    assert db.backfill_answer_features(batch_size=16) == 0
+
+
+def test_backfill_runs_one_thread_at_a_time(db, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(db_module, "backfill_answer_features", lambda: release.wait(5))
+    try:
+        first = db.start_answer_backfill()
+        assert db.start_answer_backfill() is first
+    finally:
+        release.set()
+    first.join(5)
+    assert db.start_answer_backfill() is not first
+
+
+def test_init_db_adds_feature_columns_to_older_databases(tmp_path, monkeypatch):
+    import sqlite3
+
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE categories (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, category_id INTEGER NOT NULL, prompt TEXT NOT NULL,
+            answer TEXT NOT NULL, group_name TEXT, used_count INTEGER DEFAULT 0, last_used_at TEXT DEFAULT NULL
+        );
+        INSERT INTO categories (name) VALUES ('History');
+    """)
+    conn.close()
+
+    db_module.close_connections()
+    monkeypatch.setattr(db_module, "DB_PATH", path)
+    try:
+        db_module.init_db()
+        with db_module._connection() as conn:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(questions)")}
+        assert {"answer_normalized", "answer_tokens", "answer_embedding", "answer_embedding_model"} <= columns
+    finally:
+        db_module.close_connections()
+
+
+def _pack(n: int, answer: str = "Answer") -> list[dict]:
+    return [
+        {"category": "Imported", "question": f"Question {i}?", "answer": f"{answer} {i}", "group": None, "lies": [f"Lie {i}"]}
+        for i in range(n)
+    ]
+
+
+def test_import_is_incremental(db):
+    version = db.catalog_version()
+    stats = db.import_questions(_pack(1200), batch_size=500)
+    assert (stats.read, stats.inserted, stats.updated, stats.unchanged) == (1200, 1200, 0, 0)
+    assert db.catalog_version() > version
+    assert len(db.get_question_catalog()) == 40 + 1200
+
+    version = db.catalog_version()
+    stats = db.import_questions(_pack(1200))
+    assert (stats.inserted, stats.updated, stats.unchanged) == (0, 0, 1200)
+    assert db.catalog_version() == version
+
+    changed = _pack(1200)
+    changed[3]["answer"] = "Something else"
+    changed[4]["lies"] = ["New lie", "Another"]
+    stats = db.import_questions(changed)
+    assert (stats.inserted, stats.updated, stats.unchanged) == (0, 2, 1198)
+    assert len(db.get_question_catalog()) == 40 + 1200
+
+    with db._connection() as conn:
+        rows = {r["prompt"]: r["id"] for r in conn.execute("SELECT id, prompt FROM questions WHERE prompt IN ('Question 3?', 'Question 4?')")}
+    assert db.get_question(rows["Question 3?"])["answer_normalized"] == "something else"
+    assert sorted(db.get_question(rows["Question 4?"])["lies"]) == ["Another", "New lie"]
+
+
+def test_changed_answer_drops_its_stored_embedding(db):
+    db.import_questions(_pack(2))
+    with db._connection() as conn:
+        conn.execute("UPDATE questions SET answer_embedding = ?, answer_embedding_model = 'm'", (array("f", [1.0]).tobytes(),))
+        conn.commit()
+    changed = _pack(2)
+    changed[0]["answer"] = "Different"
+    changed[1]["lies"] = []
+    db.import_questions(changed)
+    with db._connection() as conn:
+        rows = dict(conn.execute("SELECT prompt, answer_embedding_model FROM questions WHERE category_id = (SELECT id FROM categories WHERE name = 'Imported')").fetchall())
+    assert rows == {"Question 0?": None, "Question 1?": "m"}
+
+
+def test_database_from_before_migrations_is_upgraded(tmp_path, monkeypatch):
+    db_module.close_connections()
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE categories (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, category_id INTEGER NOT NULL REFERENCES categories(id),
+            prompt TEXT NOT NULL, answer TEXT NOT NULL, group_name TEXT,
+            used_count INTEGER DEFAULT 0, last_used_at TEXT DEFAULT NULL,
+            answer_normalized TEXT DEFAULT NULL
+        );
+        CREATE TABLE question_lies (id INTEGER PRIMARY KEY AUTOINCREMENT, question_id INTEGER NOT NULL REFERENCES questions(id), text TEXT NOT NULL);
+        CREATE INDEX question_lies_question ON question_lies(question_id);
+        INSERT INTO categories (name) VALUES ('History');
+        INSERT INTO questions (category_id, prompt, answer) VALUES (1, 'Who?', 'Joan of Arc');
+        INSERT INTO question_lies (question_id, text) VALUES (1, 'Boudica');
+    """)
+    conn.close()
+    monkeypatch.setattr(db_module, "DB_PATH", path)
+    try:
+        db_module.init_db()
+        db_module.init_db()  # already current: nothing to do
+        with db_module._connection() as conn:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == len(db_module._MIGRATIONS)
+            indexes = {row["name"] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"questions_content_hash", "questions_catalog", "question_lies_by_question"} <= indexes
+        assert "question_lies_question" not in indexes
+
+        question = db_module.get_question(1)
+        assert (question["answer"], question["lies"]) == ("Joan of Arc", ["Boudica"])
+        assert [q["id"] for q in db_module.search_questions("joan")[0]] == [1]
+        stats = db_module.import_questions([
+            {"category": "History", "question": "Who?", "answer": "Joan of Arc", "group": None, "lies": ["Boudica"]},
+        ])
+        assert (stats.inserted, stats.unchanged) == (0, 1)
+    finally:
+        db_module.close_connections()
+
+
+def test_concurrent_startups_migrate_once(tmp_path, monkeypatch):
+    db_module.close_connections()
+    monkeypatch.setattr(db_module, "DB_PATH", tmp_path / "questions.db")
+    barrier = threading.Barrier(3)
+    errors = []
+
+    def start():
+        barrier.wait()
+        try:
+            db_module.init_db()
+        except Exception as exc:
+            errors.append(exc)
+
+    try:
+        threads = [threading.Thread(target=start) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        with db_module._connection() as conn:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == len(db_module._MIGRATIONS)
+            assert conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0] == 40
+    finally:
+        db_module.close_connections()
+
+
+def _query_plan(db, sql: str, params=()) -> str:
+    with db._connection() as conn:
+        return " | ".join(row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+
+
+def test_catalog_read_scans_only_its_covering_index(db):
+    plan = _query_plan(db, db.CATALOG_QUERY)
+    assert "COVERING INDEX questions_catalog" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_lie_lookups_use_the_covering_index(db):
+    assert "COVERING INDEX question_lies_by_question (question_id=?)" in _query_plan(db, db.QUESTION_LIES_QUERY, (1,))
+    batch = "SELECT question_id, text FROM question_lies WHERE question_id IN (?, ?) ORDER BY id"
+    assert "COVERING INDEX question_lies_by_question (question_id=?)" in _query_plan(db, batch, (1, 2))
+
+
+def test_import_lookups_use_the_content_hash_index(db):
+    sql = "SELECT id, content_hash, answer, group_name FROM questions WHERE content_hash IN (?, ?)"
+    assert "INDEX questions_content_hash (content_hash=?)" in _query_plan(db, sql, ("a", "b"))
+
+
+def _search_ids(db, query=None, **filters) -> list[int]:
+    found, next_after = db.search_questions(query, **filters)
+    assert next_after is None
+    return [q["id"] for q in found]
+
+
+def test_search_matches_words_in_prompts_and_answers(db):
+    db.import_questions(_pack(30))
+    imported = _category(db, "Imported")["id"]
+    ids = _prompt_ids(db)
+    assert _search_ids(db, "question 1", category_id=imported) == sorted(ids[f"Question {i}?"] for i in (1, *range(10, 20)))
+    assert _search_ids(db, "ANSWER 25") == [ids["Question 25?"]]
+    assert [q["answer"] for q in db.search_questions("washingt")[0]] == ["George Washington"]
+    assert _search_ids(db, "\"answer\" OR NEAR(") == []  # query syntax is not interpreted
+    assert db.search_questions("?!") == ([], None)
+
+
+def _prompt_ids(db) -> dict[str, int]:
+    with db._connection() as conn:
+        return {r["prompt"]: r["id"] for r in conn.execute("SELECT id, prompt FROM questions")}
+
+
+def test_search_pages_are_keyed_on_the_last_id(db):
+    db.import_questions(_pack(23))
+    imported = _category(db, "Imported")["id"]
+    for query in (None, "question"):
+        pages = []
+        after = 0
+        while after is not None:
+            found, after = db.search_questions(query, category_id=imported, after=after, limit=5)
+            pages.append([q["id"] for q in found])
+        assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+        assert sum(pages, []) == sorted(_question_ids(db, imported))
+
+
+def test_search_filters_by_group(db):
+    db.import_questions([
+        {"category": "Imported", "question": f"Grouped {i}?", "answer": "X", "group": group, "lies": []}
+        for i, group in enumerate(["film", "music", None, "film"])
+    ])
+    ids = _prompt_ids(db)
+    assert _search_ids(db, "grouped", groups=["film"]) == [ids["Grouped 0?"], ids["Grouped 3?"]]
+    assert _search_ids(db, "grouped", groups=["music", None]) == [ids["Grouped 1?"], ids["Grouped 2?"]]
+    assert _search_ids(db, "grouped", groups=[]) == []
+
+
+def test_search_index_follows_question_changes(db):
+    db.import_questions(_pack(3))
+    changed = _pack(3)
+    changed[1]["answer"] = "Zeppelin"
+    db.import_questions(changed)
+    ids = _prompt_ids(db)
+    assert _search_ids(db, "zeppelin") == [ids["Question 1?"]]
+    assert _search_ids(db, "answer 1") == []
+    with db._connection() as conn:
+        conn.execute("DELETE FROM questions WHERE id = ?", (ids["Question 1?"],))
+        conn.commit()
+    assert _search_ids(db, "zeppelin") == []
+
+
+@pytest.mark.parametrize("query", [None, "answer"])
+@pytest.mark.parametrize("category_id", [None, 1])
+def test_search_pages_seek_without_sorting(db, query, category_id):
+    plan = _query_plan(db, *db._search_statement(query, category_id, None, 100, 51))
+    assert "TEMP B-TREE" not in plan
+    assert ("VIRTUAL TABLE" in plan) == (query is not None)
+    if query is None:
+        assert ("questions_by_category (category_id=? AND rowid>?)" if category_id else "PRIMARY KEY (rowid>?)") in plan
+
+
+def test_queued_writes_are_batched_into_one_transaction(db, monkeypatch):
+    ids = _question_ids(db, _category(db, "History")["id"])[:3]
+    monkeypatch.setattr(db._write_behind, "interval", 60.0)
+    commits = []
+    real_connection = db._connection
+
+    def tracking_connection():
+        commits.append(1)
+        return real_connection()
+
+    monkeypatch.setattr(db, "_connection", tracking_connection)
+    for qid in ids:
+        db.mark_questions_used([qid])
+    db.queue_writes("UPDATE questions SET used_count = used_count * 10 WHERE id = ?", [(ids[0],)])
+    db.mark_questions_used(ids[:1])
+    assert db.flush_writes(timeout=5)
+    assert len(commits) == 1
+
+    monkeypatch.setattr(db, "_connection", real_connection)
+    with real_connection() as conn:
+        counts = [conn.execute("SELECT used_count FROM questions WHERE id = ?", (qid,)).fetchone()[0] for qid in ids]
+    assert counts == [11, 1, 1]
+
+
+def test_failed_writes_are_dropped_without_blocking_flush(db):
+    db.queue_writes("UPDATE no_such_table SET x = ?", [(1,)])
+    assert db.flush_writes(timeout=5)
+
+
+def test_writer_survives_unexpected_errors(db, monkeypatch):
+    def broken_connection():
+        raise RuntimeError("pool is gone")
+
+    db.queue_writes("UPDATE questions SET used_count = ? WHERE id = ?", [({"not": "bindable"}, 1)])
+    assert db.flush_writes(timeout=5)
+    with monkeypatch.context() as patched:
+        patched.setattr(db, "_connection", broken_connection)
+        db.queue_writes("UPDATE questions SET used_count = ? WHERE id = ?", [(7, 1)])
+        assert db.flush_writes(timeout=5)
+
+    db.queue_writes("UPDATE questions SET used_count = ? WHERE id = ?", [(9, 1)])
+    assert db.flush_writes(timeout=5)
+    with db._connection() as conn:
+        assert conn.execute("SELECT used_count FROM questions WHERE id = 1").fetchone()[0] == 9
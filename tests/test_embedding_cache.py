@@ -0,0 +1,112 @@
+"""
+Embedding cache: in-memory LRU backed by a SQLite table of float32 blobs.
+
+Run with:  pytest tests/test_embedding_cache.py -v
+"""
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from server.embedding_cache import EmbeddingCache
+
+MODEL = "test-model"
+
+
+@pytest.fixture()
+def path(tmp_path):
+    return tmp_path / "embeddings.db"
+
+
+def test_round_trips_float32_vectors(path):
+    cache = EmbeddingCache(path)
+    cache.put_many(MODEL, {"paris": [0.25, -1.5, 3.0]})
+    assert list(cache.get_many(MODEL, ["paris"])["paris"]) == [0.25, -1.5, 3.0]
+    assert cache.get_many(MODEL, ["london"]) == {}
+    assert cache.get_many("other-model", ["paris"]) == {}
+    cache.close()
+
+
+def test_vectors_persist_across_instances(path):
+    first = EmbeddingCache(path)
+    first.put_many(MODEL, {"paris": [1.0, 2.0], "rome": [3.0, 4.0]})
+    first.close()
+
+    second = EmbeddingCache(path)
+    assert len(second) == 0
+    found = second.get_many(MODEL, ["rome", "paris", "oslo"])
+    assert {text: list(vector) for text, vector in found.items()} == {"paris": [1.0, 2.0], "rome": [3.0, 4.0]}
+    assert len(second) == 2
+    second.close()
+
+
+def test_memory_tier_is_bounded_lru(path):
+    cache = EmbeddingCache(path, max_entries=2)
+    cache.put_many(MODEL, {"a": [1.0]})
+    cache.put_many(MODEL, {"b": [2.0]})
+    cache.get_many(MODEL, ["a"])
+    cache.put_many(MODEL, {"c": [3.0]})
+    assert [text for _, text in cache._memory] == ["a", "c"]
+    # Evicted entries are still on disk.
+    assert list(cache.get_many(MODEL, ["b"])["b"]) == [2.0]
+    cache.close()
+
+
+def test_lookups_do_not_create_the_database(path):
+    cache = EmbeddingCache(path)
+    assert cache.get_many(MODEL, ["paris"]) == {}
+    assert not path.exists()
+
+
+def test_unwritable_disk_tier_degrades_to_memory(tmp_path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    cache = EmbeddingCache(blocker / "embeddings.db")
+    cache.put_many(MODEL, {"paris": [1.0]})
+    assert list(cache.get_many(MODEL, ["paris"])["paris"]) == [1.0]
+
+
+def test_disk_reads_do_not_block_memory_hits(path, monkeypatch):
+    cache = EmbeddingCache(path)
+    cache.put_many(MODEL, {"paris": [1.0]})
+    reading = threading.Event()
+    release = threading.Event()
+    load = cache._load
+
+    def slow_load(model, texts):
+        reading.set()
+        release.wait(5)
+        return load(model, texts)
+
+    monkeypatch.setattr(cache, "_load", slow_load)
+    miss = threading.Thread(target=cache.get_many, args=(MODEL, ["rome"]))
+    miss.start()
+    try:
+        assert reading.wait(2)
+        hit = threading.Thread(target=cache.get_many, args=(MODEL, ["paris"]))
+        hit.start()
+        hit.join(1)
+        assert not hit.is_alive()
+    finally:
+        release.set()
+        miss.join(5)
+        cache.close()
+
+
+def test_concurrent_writers_each_use_a_connection(path):
+    cache = EmbeddingCache(path)
+    threads = [
+        threading.Thread(target=cache.put_many, args=(MODEL, {f"text {i}-{j}": [float(j)] for j in range(20)}))
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cache.close()
+
+    reopened = EmbeddingCache(path)
+    texts = [f"text {i}-{j}" for i in range(8) for j in range(20)]
+    assert len(reopened.get_many(MODEL, texts)) == len(texts)
+    reopened.close()
@@ -1,20 +1,44 @@
 from __future__ import annotations
 
 import logging
+import time
 from unittest.mock import Mock, patch
 
 import pytest
 
+import server.embedding_backends as embedding_backends_module
+import server.embeddings as embeddings_module
+import server.similarity as similarity_module
+from server.embedding_backends import CircuitBreaker, EmbeddingUnavailable, HashedNgramBackend, LMStudioBackend
+from server.embedding_cache import EmbeddingCache
 from server.embeddings import (
     EMBEDDING_MODEL,
+    LIE_CHECK_BUDGET,
     LM_STUDIO_URL,
     SIMILARITY_THRESHOLD,
     _heuristic_too_similar,
     _normalize_text,
+    group_near_duplicates,
     is_too_similar,
 )
 
 
+@pytest.fixture(autouse=True)
+def embedding_cache(tmp_path, monkeypatch):
+    cache = EmbeddingCache(tmp_path / "embeddings.db")
+    monkeypatch.setattr(embeddings_module, "_cache", cache)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture(autouse=True)
+def embedding_backend(monkeypatch):
+    """A fresh default backend, so breaker state never leaks between tests."""
+    backend = embeddings_module._default_backend()
+    monkeypatch.setattr(embeddings_module, "_backend", backend)
+    return backend
+
+
 @pytest.mark.parametrize(
     ("lie", "truth", "expected_request_input", "embeddings", "expected"),
     [
@@ -71,23 +95,66 @@ def test_is_too_similar_uses_embedding_comparison(lie, truth, expected_request_i
         ]
     }
 
-    with patch("server.embeddings.requests.post", return_value=response) as mock_post:
+    with patch("server.embedding_backends.requests.Session.post", return_value=response) as mock_post:
         assert is_too_similar(lie, truth) is expected
 
     mock_post.assert_called_once()
     _, kwargs = mock_post.call_args
-    assert kwargs["timeout"] == 2.0
+    assert kwargs["timeout"] == LIE_CHECK_BUDGET
     assert kwargs["json"] == {"input": expected_request_input, "model": EMBEDDING_MODEL}
     assert mock_post.call_args.args[0] == f"{LM_STUDIO_URL}/v1/embeddings"
 
 
 def test_is_too_similar_falls_back_to_normalized_text_on_embedding_error():
-    with patch("server.embeddings.requests.post", side_effect=RuntimeError("LM Studio unavailable")):
+    with patch("server.embedding_backends.requests.Session.post", side_effect=RuntimeError("LM Studio unavailable")):
         assert is_too_similar("nineteen forty-five", "1945") is True
         assert is_too_similar("  Eiffel Tower ", "eiffel tower") is True
         assert is_too_similar("Arc de Triomphe", "Eiffel Tower") is False
 
 
+def test_is_too_similar_gives_the_heuristic_verdict_when_the_budget_runs_out(monkeypatch):
+    class SlowBackend:
+        model = "slow"
+        remote = True
+
+        def embed(self, texts, timeout=None):
+            time.sleep(1.0)  # ignores its timeout, like a stalled connection
+            return [[1.0, 0.0]] * len(texts)
+
+    monkeypatch.setattr(embeddings_module, "_backend", SlowBackend())
+    monkeypatch.setattr(embeddings_module, "LIE_CHECK_BUDGET", 0.1)
+    start = time.monotonic()
+    assert is_too_similar("The Eiffel Tower", "Eiffel Tower") is True
+    assert is_too_similar("Arc de Triomphe", "Eiffel Tower") is False
+    assert time.monotonic() - start < 0.5
+
+
+def test_is_too_similar_requests_only_uncached_embeddings(embedding_cache):
+    response = Mock()
+    response.json.return_value = {"data": [{"embedding": [1.0, 0.0, 0.0]}, {"embedding": [0.2, 0.98, 0.0]}]}
+    with patch("server.embedding_backends.requests.Session.post", return_value=response) as mock_post:
+        assert is_too_similar("Library of Alexandria", "Lighthouse of Alexandria") is False
+        assert is_too_similar("library  of Alexandria", "Lighthouse of Alexandria") is False
+    mock_post.assert_called_once()
+
+    response.json.return_value = {"data": [{"embedding": [0.95, 0.3, 0.0]}]}
+    with patch("server.embedding_backends.requests.Session.post", return_value=response) as mock_post:
+        assert is_too_similar("Pharos of Alexandria", "Lighthouse of Alexandria") is False
+    assert mock_post.call_args.kwargs["json"]["input"] == ["pharos of alexandria"]
+
+
+def test_is_too_similar_with_a_primed_truth_embeds_only_the_lie():
+    truth = embeddings_module.prepare_text("Lighthouse of Alexandria")
+    embeddings_module.prime_embedding(truth.normalized, [0.2, 0.98, 0.0], EMBEDDING_MODEL)
+    response = Mock()
+    response.json.return_value = {"data": [{"embedding": [1.0, 0.0, 0.0]}]}
+    with patch("server.embedding_backends.requests.Session.post", return_value=response) as mock_post, \
+            patch("server.embeddings._normalize_text", wraps=_normalize_text) as normalize:
+        assert is_too_similar("Library of Alexandria", "Lighthouse of Alexandria", truth) is False
+    assert mock_post.call_args.kwargs["json"]["input"] == ["library of alexandria"]
+    normalize.assert_called_once_with("Library of Alexandria")
+
+
 def test_is_too_similar_rejects_partial_name_match_below_threshold():
     response = Mock()
     response.json.return_value = {
@@ -97,7 +164,7 @@ def test_is_too_similar_rejects_partial_name_match_below_threshold():
         ]
     }
 
-    with patch("server.embeddings.requests.post", return_value=response):
+    with patch("server.embedding_backends.requests.Session.post", return_value=response):
         assert is_too_similar("Washington", "George Washington") is True
 
 
@@ -110,7 +177,7 @@ def test_is_too_similar_rejects_partial_name_match_with_minor_typo_below_thresho
         ]
     }
 
-    with patch("server.embeddings.requests.post", return_value=response):
+    with patch("server.embedding_backends.requests.Session.post", return_value=response):
         assert is_too_similar("Washington", "George Washinton") is True
 
 
@@ -123,7 +190,7 @@ def test_is_too_similar_logs_similarity_details(caplog):
         ]
     }
 
-    with patch("server.embeddings.requests.post", return_value=response), caplog.at_level(logging.DEBUG):
+    with patch("server.embedding_backends.requests.Session.post", return_value=response), caplog.at_level(logging.DEBUG):
         assert is_too_similar("Washington", "George Washington") is True
 
     assert "similarity=0.800000" in caplog.text
@@ -138,6 +205,9 @@ def test_is_too_similar_logs_similarity_details(caplog):
         ("twenty-one pilots", "21 pilots"),
         ("one hundred and one", "101"),
         ("The Lighthouse of Alexandria", "the lighthouse of alexandria"),
+        ("Mount Everest , Nepal !", "mount everest, nepal!"),
+        ("Three Men and a Baby", "3 men and a baby"),
+        ("Route sixty-six (USA)", "route 66 ( usa )"),
     ],
 )
 def test_normalize_text(text, expected):
@@ -158,3 +228,91 @@ def test_heuristic_too_similar(left, right, expected):
 
 def test_similarity_threshold_matches_tuned_value():
     assert SIMILARITY_THRESHOLD == 0.75
+
+
+def test_local_backend_is_deterministic_and_normalized():
+    backend = HashedNgramBackend()
+    first, again = backend.embed(["eiffel tower", "eiffel tower"])
+    assert list(first) == list(again)
+    assert len(first) == backend.dim
+    assert abs(sum(x * x for x in first) - 1.0) < 1e-5
+
+
+def test_local_backend_matches_without_numpy(monkeypatch):
+    backend = HashedNgramBackend()
+    with_numpy = backend.embed(["lighthouse of alexandria"])[0]
+    monkeypatch.setattr(embedding_backends_module, "np", None)
+    without_numpy = backend.embed(["lighthouse of alexandria"])[0]
+    assert max(abs(x - y) for x, y in zip(with_numpy, without_numpy)) < 1e-6
+
+
+def test_is_too_similar_with_local_backend_needs_no_http(monkeypatch):
+    monkeypatch.setattr(embeddings_module, "_backend", HashedNgramBackend())
+    with patch("server.embedding_backends.requests.Session.post") as mock_post:
+        assert is_too_similar("Eifel Tower", "Eiffel Tower") is True
+        assert is_too_similar("Big Ben", "Eiffel Tower") is False
+    mock_post.assert_not_called()
+
+
+def test_similarity_matrix_matches_without_numpy(monkeypatch):
+    vectors = [[1.0, 0.0, 0.0], [0.6, 0.8, 0.0], [0.0, 0.0, 0.0]]
+    with_numpy = similarity_module.similarity_matrix(vectors)
+    monkeypatch.setattr(similarity_module, "np", None)
+    without_numpy = similarity_module.similarity_matrix(vectors)
+    for row_a, row_b in zip(with_numpy, without_numpy):
+        assert max(abs(x - y) for x, y in zip(row_a, row_b)) < 1e-9
+    assert abs(without_numpy[0][1] - 0.6) < 1e-9
+    assert without_numpy[2][2] == 0.0
+    assert similarity_module.cosine(vectors[0], vectors[1]) == pytest.approx(0.6)
+
+
+def test_group_near_duplicates_with_local_backend(monkeypatch):
+    monkeypatch.setattr(embeddings_module, "_backend", HashedNgramBackend())
+    texts = ["Eiffel Tower", "Big Ben", "the eiffel tower", "eiffel tower!"]
+    assert group_near_duplicates(texts, threshold=0.8) == [[0, 2, 3], [1]]
+
+
+def test_group_near_duplicates_never_calls_a_remote_backend():
+    with patch("server.embedding_backends.requests.Session.post") as mock_post:
+        assert group_near_duplicates(["Big Ben", "big ben", "Eiffel Tower"]) == [[0, 1], [2]]
+    mock_post.assert_not_called()
+
+
+def test_circuit_breaker_skips_the_remote_after_repeated_failures(embedding_backend):
+    with patch("server.embedding_backends.requests.Session.post", side_effect=ConnectionError("refused")) as mock_post:
+        for i in range(5):
+            assert is_too_similar(f"lie {i}", "Eiffel Tower") is False
+    assert mock_post.call_count == embedding_backend.breaker.failure_threshold
+    assert embedding_backend.breaker.is_open
+
+
+def test_circuit_breaker_probes_once_after_cooldown():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10.0, clock=lambda: now[0])
+    backend = LMStudioBackend(LM_STUDIO_URL, EMBEDDING_MODEL, 2.0, breaker=breaker)
+    response = Mock()
+    response.json.return_value = {"data": [{"embedding": [1.0, 0.0]}]}
+
+    with patch("server.embedding_backends.requests.Session.post", side_effect=ConnectionError("refused")):
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                backend.embed(["a"])
+    with pytest.raises(EmbeddingUnavailable):
+        backend.embed(["a"])
+
+    now[0] = 11.0
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    now[0] = 22.0
+    with patch("server.embedding_backends.requests.Session.post", return_value=response):
+        assert backend.embed(["a"]) == [[1.0, 0.0]]
+    assert not breaker.is_open
+
+
+def test_remote_backend_reuses_one_session():
+    backend = LMStudioBackend(LM_STUDIO_URL, EMBEDDING_MODEL, 2.0, pool_size=4)
+    adapter = backend.session.get_adapter(LM_STUDIO_URL)
+    assert adapter._pool_maxsize == 4
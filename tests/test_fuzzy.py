@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import random
+from difflib import SequenceMatcher
+
+import pytest
+
+from server.fuzzy import FuzzyPattern, ratio
+
+
+def _lcs_length(a: str, b: str) -> int:
+    row = [0] * (len(b) + 1)
+    for char in a:
+        previous = 0
+        for j, other in enumerate(b):
+            previous, row[j + 1] = row[j + 1], previous + 1 if char == other else max(row[j + 1], row[j])
+    return row[-1]
+
+
+@pytest.mark.parametrize(
+    ("a", "b", "expected"),
+    [
+        ("washington", "washington", 1.0),
+        ("washinton", "washington", 18 / 19),
+        ("abc", "xyz", 0.0),
+        ("", "", 1.0),
+        ("", "abc", 0.0),
+    ],
+)
+def test_ratio(a, b, expected):
+    assert ratio(a, b) == pytest.approx(expected)
+
+
+def test_ratio_matches_lcs_and_never_falls_below_sequence_matcher():
+    rng = random.Random(7)
+    for _ in range(2000):
+        a = "".join(rng.choice("abcde") for _ in range(rng.randint(0, 70)))
+        b = "".join(rng.choice("abcdef") for _ in range(rng.randint(0, 70)))
+        expected = 2 * _lcs_length(a, b) / (len(a) + len(b)) if a or b else 1.0
+        assert ratio(a, b) == pytest.approx(expected)
+        assert ratio(a, b) >= SequenceMatcher(None, a, b).ratio() - 1e-12
+
+
+def test_cutoff_only_drops_scores_below_it():
+    pattern = FuzzyPattern("alexandria")
+    assert pattern.ratio("alexandra", cutoff=0.88) == pytest.approx(ratio("alexandria", "alexandra"))
+    assert pattern.ratio("alexander", cutoff=0.88) == 0.0
+    assert pattern.ratio("zzzzzzzzzz", cutoff=0.5) == 0.0
+
+
+def test_best_ratio_against_many_candidates():
+    pattern = FuzzyPattern("pharos")
+    assert pattern.best_ratio(["lighthouse", "of", "pharoh", "pharos"]) == 1.0
+    assert pattern.best_ratio(["lighthouse", "pharoh"], cutoff=0.8) == pytest.approx(ratio("pharos", "pharoh"))
+    assert pattern.best_ratio(["lighthouse", "alexandria"], cutoff=0.88) == 0.0
+    assert pattern.best_ratio([]) == 0.0
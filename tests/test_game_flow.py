@@ -28,26 +28,6 @@ FAST_TIMEOUTS = {k: 0.15 for k in [
 ]}
 
 
-# ---------------------------------------------------------------------------
-# Fixtures
-# ---------------------------------------------------------------------------
-
-@pytest.fixture(scope="module")
-def app():
-    from server import create_app
-    application = create_app()
-    application.config["TESTING"] = True
-    return application
-
-
-@pytest.fixture()
-def client(app):
-    game_module.reset_game()
-    with app.test_client() as c:
-        yield c
-    game_module.reset_game()
-
-
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
@@ -100,6 +80,9 @@ def cast_like(client, player_id: str) -> None:
     # No likeable answer — acceptable edge case, timer will advance the phase.
 
 
+LIE_AUTHORS = ("alpha", "bravo", "charlie", "delta", "echo")
+
+
 def play_turn(client, player_ids: list[str]) -> dict:
     """
     Drive one complete turn starting from category_pick.
@@ -124,9 +107,11 @@ def play_turn(client, player_ids: list[str]) -> dict:
     for i, pid in enumerate(player_ids):
         r = api_post(client, "/api/game/lie", {
             "player_id": pid,
-            "text": f"Totally plausible answer number {i} by {pid[:6]}",
+            # Words only: a digit in the lie (say, from the player id) can
+            # match a numeric answer and get the lie rejected.
+            "text": f"Totally plausible answer from {LIE_AUTHORS[i]}",
         })
-        assert r.status_code == 200, f"lie submission failed for player {i}: {r.get_json()}"
+        assert r.status_code == 202, f"lie submission failed for player {i}: {r.get_json()}"
 
     # --- Voting ---
     wait_for(client, "voting")
@@ -238,11 +223,11 @@ def test_player_cannot_like_own_lie(client):
         assert api_post(client, "/api/game/lie", {
             "player_id": alice_id,
             "text": "Alice lie",
-        }).status_code == 200
+        }).status_code == 202
         assert api_post(client, "/api/game/lie", {
             "player_id": bob_id,
             "text": "Bob lie",
-        }).status_code == 200
+        }).status_code == 202
 
         wait_for(client, "voting")
         for pid in player_ids:
@@ -291,7 +276,7 @@ def test_last_lie_submission_stops_clock_before_advancing(client):
         assert api_post(client, "/api/game/lie", {
             "player_id": player_ids[0],
             "text": "Alice lie",
-        }).status_code == 200
+        }).status_code == 202
 
         emit_mock.reset_mock()
 
@@ -299,7 +284,7 @@ def test_last_lie_submission_stops_clock_before_advancing(client):
             "player_id": player_ids[1],
             "text": "Bob lie",
         })
-        assert r.status_code == 200, r.get_json()
+        assert r.status_code == 202, r.get_json()
 
         s = wait_for(client, "voting")
         assert s["phase"] == "voting"
@@ -351,11 +336,11 @@ def test_player_can_like_during_voting_after_voting(client):
         assert api_post(client, "/api/game/lie", {
             "player_id": alice_id,
             "text": "Alice lie",
-        }).status_code == 200
+        }).status_code == 202
         assert api_post(client, "/api/game/lie", {
             "player_id": bob_id,
             "text": "Bob lie",
-        }).status_code == 200
+        }).status_code == 202
 
         s = wait_for(client, "voting")
         like_answer_id = next(
@@ -418,11 +403,11 @@ def test_player_can_like_the_truth(client):
         assert api_post(client, "/api/game/lie", {
             "player_id": alice_id,
             "text": "Alice lie",
-        }).status_code == 200
+        }).status_code == 202
         assert api_post(client, "/api/game/lie", {
             "player_id": bob_id,
             "text": "Bob lie",
-        }).status_code == 200
+        }).status_code == 202
 
         s = wait_for(client, "voting")
         truth_answer_id = next(
@@ -479,15 +464,67 @@ def test_voting_answers_include_normalized_text(client):
         assert api_post(client, "/api/game/lie", {
             "player_id": alice_id,
             "text": "twenty-four",
-        }).status_code == 200
+        }).status_code == 202
         assert api_post(client, "/api/game/lie", {
             "player_id": bob_id,
             "text": "Bob lie",
-        }).status_code == 200
+        }).status_code == 202
 
-        s = wait_for(client, "voting")
+        wait_for(client, "voting")
+        with patch.object(game_module, "normalize_answer_text") as normalize:
+            s = get_state(client)
+        normalize.assert_not_called()  # broadcasts reuse Answer.normalized_text
         normalized_answer = next(
             a for a in s["current_turn"]["answers"]
             if a["text"] == "twenty-four"
         )
         assert normalized_answer["normalized_text"] == "24"
+
+
+def test_duplicate_lies_merge_into_one_option(client):
+    """Two players submitting the same lie share one voting option and its points."""
+    with patch.object(game_module, "ROUND_CONFIG", FAST_ROUND_CONFIG):
+        player_ids = []
+        for name in ["Alice", "Bob", "Carol"]:
+            r = api_post(client, "/api/players", {"name": name})
+            assert r.status_code == 200, r.get_json()
+            player_ids.append(r.get_json()["player_id"])
+        alice_id, bob_id, carol_id = player_ids
+
+        assert api_post(client, "/api/game/start", {}).status_code == 200
+        s = wait_for(client, "category_pick")
+        categories = client.get("/api/categories").get_json()
+        r = api_post(client, "/api/game/category", {
+            "player_id": s["active_player_id"],
+            "category_id": categories[0]["id"],
+        })
+        assert r.status_code == 200, r.get_json()
+
+        wait_for(client, "lie_submission")
+        for pid, text in [(alice_id, "The Pharos"), (bob_id, "the pharos"), (carol_id, "Carol lie")]:
+            assert api_post(client, "/api/game/lie", {"player_id": pid, "text": text}).status_code == 202
+
+        s = wait_for(client, "voting")
+        merged = [a for a in s["current_turn"]["answers"] if a["normalized_text"] == "the pharos"]
+        assert len(merged) == 1
+        assert sorted(merged[0]["author_ids"]) == sorted([alice_id, bob_id])
+
+        r = api_post(client, "/api/game/vote", {"player_id": bob_id, "answer_id": merged[0]["answer_id"]})
+        assert r.get_json()["error"] == "You cannot vote for your own lie"
+        assert api_post(client, "/api/game/vote", {
+            "player_id": carol_id,
+            "answer_id": merged[0]["answer_id"],
+        }).status_code == 200
+        for pid in (alice_id, bob_id):
+            cast_vote(client, pid)
+
+        s = wait_for(client, "likes")
+        revealed = next(a for a in s["current_turn"]["answers"] if a["answer_id"] == merged[0]["answer_id"])
+        assert sorted(revealed["author_names"]) == ["Alice", "Bob"]
+        for pid in player_ids:
+            cast_like(client, pid)
+
+        s = wait_for(client, "round_results")
+        score_changes = game_module.get_game().current_round.current_turn.score_changes
+        assert score_changes[alice_id] >= game_module.FOOLED_BASE
+        assert score_changes[bob_id] >= game_module.FOOLED_BASE
@@ -0,0 +1,123 @@
+"""
+Lie validation: similarity checks run in a worker pool outside the room lock
+and the verdict is delivered to the player's sockets as "lie_result".
+
+Run with:  pytest tests/test_lie_validation.py -v
+"""
+from __future__ import annotations
+
+import threading
+import time
+from unittest.mock import patch
+
+import server.game as game_module
+import server.routes as routes_module
+
+
+def start_turn(client, names: list[str]) -> list[str]:
+    player_ids = [client.post("/api/players", json={"name": name}).get_json()["player_id"] for name in names]
+    assert client.post("/api/game/start", json={}).status_code == 200
+    state = client.get("/api/game/state").get_json()
+    category_id = client.get("/api/categories").get_json()[0]["id"]
+    r = client.post("/api/game/category", json={"player_id": state["active_player_id"], "category_id": category_id})
+    assert r.status_code == 200, r.get_json()
+    return player_ids
+
+
+def player_socket(app, player_id: str):
+    from server import socketio
+    sio_client = socketio.test_client(app, query_string="role=player")
+    sio_client.emit("identify", {"player_id": player_id})
+    sio_client.get_received()
+    return sio_client
+
+
+def wait_for_result(sio_client, timeout: float = 2.0) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for message in sio_client.get_received():
+            if message["name"] == "lie_result":
+                return message["args"][0]
+        time.sleep(0.01)
+    raise AssertionError("no lie_result received")
+
+
+def test_slow_checks_do_not_hold_the_room_lock(app, client):
+    alice, bob, carol = start_turn(client, ["Alice", "Bob", "Carol"])
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def slow_check(lie, truth, prepared=None):
+        started.release()
+        release.wait(5)
+        return False
+
+    with patch.object(routes_module, "is_too_similar", side_effect=slow_check):
+        for pid in (alice, bob):
+            assert client.post("/api/game/lie", json={"player_id": pid, "text": f"lie from {pid}"}).status_code == 202
+        # Both checks are in flight at once, and the room stays responsive.
+        assert started.acquire(timeout=2) and started.acquire(timeout=2)
+        assert client.patch(f"/api/players/{bob}", json={"name": "Robert"}).status_code == 200
+        assert client.post("/api/game/lie", json={"player_id": alice, "text": "again"}).get_json()["error"] == "Already submitted a lie"
+        release.set()
+
+        deadline = time.time() + 2
+        while not all(p.has_submitted_lie for p in game_module.get_game().players.values() if p.player_id != carol):
+            assert time.time() < deadline
+            time.sleep(0.01)
+
+
+def test_rejected_lie_is_reported_over_the_socket(app, client):
+    alice, bob = start_turn(client, ["Alice", "Bob"])
+    sio_client = player_socket(app, alice)
+    try:
+        truth = game_module.get_game().current_round.current_turn.real_answer_text
+        assert client.post("/api/game/lie", json={"player_id": alice, "text": truth}).status_code == 202
+        result = wait_for_result(sio_client)
+        assert result["status"] == "rejected"
+        assert "too close" in result["error"]
+        assert not game_module.get_game().players[alice].has_submitted_lie
+
+        assert client.post("/api/game/lie", json={"player_id": alice, "text": "Something else entirely"}).status_code == 202
+        assert wait_for_result(sio_client) == {"status": "submitted"}
+        assert game_module.get_game().players[alice].has_submitted_lie
+    finally:
+        sio_client.disconnect()
+
+
+def test_verdict_after_the_phase_ends_is_expired(app, client):
+    alice, bob = start_turn(client, ["Alice", "Bob"])
+    sio_client = player_socket(app, alice)
+    release = threading.Event()
+
+    def slow_check(lie, truth, prepared=None):
+        release.wait(5)
+        return False
+
+    try:
+        with patch.object(routes_module, "is_too_similar", side_effect=slow_check):
+            assert client.post("/api/game/lie", json={"player_id": alice, "text": "late lie"}).status_code == 202
+            game = game_module.get_game()
+            with game.lock:
+                routes_module._stop_phase_clock(game)
+                routes_module._advance_to_voting(game)
+            release.set()
+            assert wait_for_result(sio_client)["status"] == "expired"
+        assert game_module.get_game().phase == "voting"
+    finally:
+        sio_client.disconnect()
+
+
+def test_failed_check_asks_the_player_to_retry(app, client):
+    alice, bob = start_turn(client, ["Alice", "Bob"])
+    sio_client = player_socket(app, alice)
+    try:
+        with patch.object(routes_module, "is_too_similar", side_effect=ValueError("boom")):
+            assert client.post("/api/game/lie", json={"player_id": alice, "text": "a lie"}).status_code == 202
+            assert wait_for_result(sio_client)["status"] == "error"
+        assert not game_module.get_game().players[alice].has_submitted_lie
+
+        assert client.post("/api/game/lie", json={"player_id": alice, "text": "a lie"}).status_code == 202
+        assert wait_for_result(sio_client) == {"status": "submitted"}
+    finally:
+        sio_client.disconnect()
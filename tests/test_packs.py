@@ -0,0 +1,88 @@
+"""
+Question pack readers.
+
+Run with:  pytest tests/test_packs.py -v
+"""
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+
+from server.packs import _iter_json_array, read_pack
+
+ENTRIES = [
+    {"category": "History", "question": "Who?", "answer": "Joan of Arc", "lies": ["Boudica"], "group": "people"},
+    {"category": "Geography", "question": "Where?", "answer": "Canberra", "lies": ["Sydney", "Melbourne"]},
+]
+
+
+def test_json_array_is_decoded_across_chunk_boundaries():
+    text = json.dumps(ENTRIES * 20, indent=2)
+    for chunk_size in (1, 7, 64, 1 << 16):
+        assert list(_iter_json_array(io.StringIO(text), chunk_size)) == ENTRIES * 20
+
+
+@pytest.mark.parametrize("text", [
+    "", "{}", "[{\"a\": 1}", "[{\"a\": ",
+    "[,{\"a\": 1}]", "[,,{\"a\": 1}]", "[{\"a\": 1},]", "[{\"a\": 1},,{\"b\": 2}]", "[{\"a\": 1}{\"b\": 2}]", "[,]",
+])
+def test_json_array_rejects_malformed_input(text):
+    with pytest.raises(ValueError):
+        list(_iter_json_array(io.StringIO(text), 4))
+
+
+def test_json_array_edge_cases_across_chunks():
+    for chunk_size in (1, 3, 64):
+        assert list(_iter_json_array(io.StringIO(" [ ] "), chunk_size)) == []
+        assert list(_iter_json_array(io.StringIO("[12345, 6]"), chunk_size)) == [12345, 6]
+
+
+def test_every_format_reads_the_same_entries(tmp_path):
+    (tmp_path / "pack.json").write_text(json.dumps(ENTRIES))
+    (tmp_path / "pack.ndjson").write_text("\n".join(json.dumps(e) for e in ENTRIES) + "\n\n")
+    (tmp_path / "pack.csv").write_text(
+        "category,question,answer,group,lies\n"
+        "History,Who?,Joan of Arc,people,Boudica\n"
+        "Geography,Where?,Canberra,,Sydney|Melbourne\n"
+    )
+    expected = [
+        {"category": "History", "question": "Who?", "answer": "Joan of Arc", "group": "people", "lies": ["Boudica"]},
+        {"category": "Geography", "question": "Where?", "answer": "Canberra", "group": None, "lies": ["Sydney", "Melbourne"]},
+    ]
+    for name in ("pack.json", "pack.ndjson", "pack.csv"):
+        assert list(read_pack(tmp_path / name)) == expected
+
+
+def test_packs_saved_with_a_byte_order_mark_are_read(tmp_path):
+    (tmp_path / "pack.csv").write_text(
+        "category,question,answer,group,lies\nHistory,Who?,Joan of Arc,people,Boudica\n", encoding="utf-8-sig"
+    )
+    (tmp_path / "pack.json").write_text(json.dumps(ENTRIES[:1]), encoding="utf-8-sig")
+    for name in ("pack.csv", "pack.json"):
+        assert list(read_pack(tmp_path / name)) == [
+            {"category": "History", "question": "Who?", "answer": "Joan of Arc", "group": "people", "lies": ["Boudica"]},
+        ]
+
+
+def test_entries_missing_required_fields_are_reported(tmp_path):
+    path = tmp_path / "pack.ndjson"
+    path.write_text(json.dumps(ENTRIES[0]) + "\n" + json.dumps({"category": "History", "question": "Q"}) + "\n")
+    with pytest.raises(ValueError, match="pack.ndjson entry 2: missing 'answer'"):
+        list(read_pack(path))
+
+
+@pytest.mark.parametrize(
+    ("field", "value", "message"),
+    [
+        ("group", 7, "'group' must be text"),
+        ("lies", "Boudica", "'lies' must be a list of text"),
+        ("lies", ["Boudica", 3], "'lies' must be a list of text"),
+    ],
+)
+def test_entries_with_mistyped_fields_are_reported(tmp_path, field, value, message):
+    path = tmp_path / "pack.json"
+    path.write_text(json.dumps([{**ENTRIES[0], field: value}]))
+    with pytest.raises(ValueError, match=f"pack.json entry 1: {message}"):
+        list(read_pack(path))
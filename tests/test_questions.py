@@ -0,0 +1,148 @@
+"""
+In-memory question index and per-room question pools.
+
+Run with:  pytest tests/test_questions.py -v
+"""
+from __future__ import annotations
+
+import random
+
+import pytest
+
+import server.db as db_module
+import server.game as game_module
+import server.questions as questions_module
+from server.questions import QuestionIndex, QuestionPool, _random_bit, pick_any_question, pick_question
+
+# (id, category_id, group_name)
+CATALOG = [
+    (1, 10, "film"), (2, 10, "film"), (3, 10, None), (4, 10, "music"),
+    (5, 20, "capitals"), (6, 20, None),
+]
+
+
+NAMES = [(20, "Geography"), (30, "Empty"), (10, "Pop Culture")]
+
+
+def test_category_list_counts_playable_questions_per_group_selection():
+    index = QuestionIndex(CATALOG, version=1, category_names=NAMES)
+    assert index.category_list(None) == [
+        {"id": 20, "name": "Geography", "question_count": 2},
+        {"id": 10, "name": "Pop Culture", "question_count": 4},
+    ]
+    assert index.category_list(["music"]) == [
+        {"id": 20, "name": "Geography", "question_count": 1},
+        {"id": 10, "name": "Pop Culture", "question_count": 2},
+    ]
+    assert index.category_list(["music", "film"]) is index.category_list(["film", "music"])
+
+
+def test_groups_are_counted_with_ungrouped_first():
+    index = QuestionIndex(CATALOG, version=1, category_names=NAMES)
+    assert index.groups == [
+        {"name": "Ungrouped", "question_count": 2},
+        {"name": "capitals", "question_count": 1},
+        {"name": "film", "question_count": 2},
+        {"name": "music", "question_count": 1},
+    ]
+
+
+def test_pool_only_offers_included_groups_and_ungrouped():
+    index = QuestionIndex(CATALOG, version=1)
+    pool = QuestionPool(index, ["film"], used_ids=set())
+    taken = {pool.take(10, []) for _ in range(3)}
+    assert taken == {1, 2, 3}
+    assert pool.take(10, []) is None
+    assert pool.categories_left() == [20]
+
+
+def test_pool_skips_used_ids_and_drains():
+    index = QuestionIndex(CATALOG, version=1)
+    pool = QuestionPool(index, None, used_ids={1, 2, 3, 5})
+    assert pool.take(10, []) == 4
+    assert pool.take(10, []) is None
+    assert pool.take(20, []) == 6
+    assert pool.categories_left() == []
+
+
+def test_pool_weights_follow_player_history(monkeypatch):
+    index = QuestionIndex(CATALOG, version=1)
+    # Question 1 was answered correctly by everyone (weight 1.0) and the
+    # three unseen ones weigh 3.0 each, so 1 should come up about 1 in 10.
+    histories = [{"1": "correct"}, {"1": "correct"}]
+    rng = random.Random(7)
+    monkeypatch.setattr(questions_module, "random", rng)
+    picks = [QuestionPool(index, None, set()).take(10, histories) for _ in range(2000)]
+    assert 120 < picks.count(1) < 280
+    assert {2, 3, 4} <= set(picks)
+
+
+@pytest.mark.parametrize("bits", [0b1, 0b1011, 1 << 200 | 1 << 3, (1 << 300) - 1])
+def test_random_bit_returns_a_set_bit(bits):
+    seen = {_random_bit(bits) for _ in range(2000)}
+    assert all(bits >> bit & 1 for bit in seen)
+    if bin(bits).count("1") <= 3:
+        assert len(seen) == bin(bits).count("1")
+
+
+@pytest.fixture()
+def game():
+    db_module.init_db()
+    game = game_module.reset_game()
+    yield game
+    game_module.reset_game()
+
+
+def test_room_pool_serves_each_question_once(game):
+    category = questions_module.get_categories()[0]
+    served = []
+    while (question := pick_question(game, category["id"], [])) is not None:
+        served.append(question["id"])
+        assert question["category_id"] == category["id"]
+    assert len(served) == category["question_count"] == len(set(served))
+
+    fallback = pick_any_question(game, [])
+    assert fallback is not None and fallback["category_id"] != category["id"]
+
+
+def test_index_is_rebuilt_when_the_catalog_changes(game):
+    first = questions_module.question_index()
+    assert questions_module.question_index() is first
+    db_module.init_db()
+    assert questions_module.question_index() is not first
+
+
+def test_categories_endpoint_filters_by_the_rooms_groups(game):
+    from server import create_app
+    app = create_app()
+    app.config["TESTING"] = True
+    group = next(g["name"] for g in questions_module.get_groups() if g["name"] != "Ungrouped")
+    game.included_groups = [group]
+    with app.test_client() as client:
+        categories = client.get("/api/categories").get_json()
+    assert categories == questions_module.get_categories([group])
+    assert 0 < sum(c["question_count"] for c in categories) < len(db_module.get_question_catalog())
+
+
+def test_questions_endpoint_searches_and_pages(game):
+    from server import create_app
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        found = client.get("/api/questions", query_string={"q": "washington"}).get_json()
+        assert [q["answer"] for q in found["questions"]] == ["George Washington"]
+        assert found["next_after"] is None
+
+        seen = []
+        params = {"limit": 15, "group": ["Ungrouped", "geology"]}
+        while True:
+            page = client.get("/api/questions", query_string=params).get_json()
+            seen += page["questions"]
+            if page["next_after"] is None:
+                break
+            params["after"] = page["next_after"]
+        assert seen and {q["group_name"] for q in seen} <= {None, "geology"}
+        assert [q["id"] for q in seen] == sorted({q["id"] for q in seen})
+
+        r = client.get("/api/questions", query_string={"category_id": "history"})
+        assert r.status_code == 400
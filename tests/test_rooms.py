@@ -0,0 +1,151 @@
+"""
+Room registry: several independent games hosted by one server process.
+
+Run with:  pytest tests/test_rooms.py -v
+"""
+from __future__ import annotations
+
+import time
+
+import server.game as game_module
+
+
+def create_room(client) -> str:
+    r = client.post("/api/rooms")
+    assert r.status_code == 201, r.get_json()
+    return r.get_json()["room_code"]
+
+
+def add_player(client, room_code: str, name: str) -> str:
+    r = client.post(f"/api/rooms/{room_code}/players", json={"name": name})
+    assert r.status_code == 200, r.get_json()
+    return r.get_json()["player_id"]
+
+
+def test_rooms_keep_independent_game_state(client):
+    room_a = create_room(client)
+    room_b = create_room(client)
+    assert room_a != room_b
+
+    add_player(client, room_a, "Alice")
+    add_player(client, room_a, "Bob")
+    add_player(client, room_b, "Carol")
+
+    state_a = client.get(f"/api/rooms/{room_a}/game/state").get_json()
+    state_b = client.get(f"/api/rooms/{room_b}/game/state").get_json()
+    assert state_a["room_code"] == room_a
+    assert [p["name"] for p in state_a["players"]] == ["Alice", "Bob"]
+    assert [p["name"] for p in state_b["players"]] == ["Carol"]
+
+    r = client.post(f"/api/rooms/{room_a}/game/start", json={})
+    assert r.status_code == 200, r.get_json()
+    assert client.get(f"/api/rooms/{room_a}/game/state").get_json()["phase"] == "category_pick"
+    assert client.get(f"/api/rooms/{room_b}/game/state").get_json()["phase"] == "lobby"
+
+    # The unscoped routes keep serving the default room.
+    default_state = client.get("/api/game/state").get_json()
+    assert default_state["room_code"] == game_module.DEFAULT_ROOM_CODE
+    assert default_state["players"] == []
+
+
+def test_room_codes_are_case_insensitive(client):
+    room = create_room(client)
+    r = client.get(f"/api/rooms/{room.lower()}/game/state")
+    assert r.status_code == 200
+    assert r.get_json()["room_code"] == room
+
+
+def test_unknown_room_returns_404(client):
+    r = client.get("/api/rooms/ZZZZZZ/game/state")
+    assert r.status_code == 404
+    assert r.get_json()["error"] == "Room not found"
+
+
+def test_room_codes_are_not_listed(client):
+    create_room(client)
+    assert client.get("/api/rooms").status_code == 405
+
+
+def test_player_page_keeps_a_session_per_room(client):
+    room = create_room(client)
+    # The default room keeps the unscoped key; other rooms get their own.
+    assert b"const STORAGE_KEY = true ?" in client.get("/players/").data
+    assert b"const STORAGE_KEY = false ?" in client.get(f"/players/{room}/").data
+
+
+def test_expire_idle_rooms_keeps_default_room(client):
+    room = create_room(client)
+    for code in (room, game_module.DEFAULT_ROOM_CODE):
+        game_module.get_game(code).last_active_at -= game_module.ROOM_IDLE_TIMEOUT_S + 1
+
+    expired = game_module.expire_idle_rooms()
+    assert room in expired
+    assert game_module.DEFAULT_ROOM_CODE not in expired
+    assert game_module.get_game(room) is None
+    assert client.get(f"/api/rooms/{room}/game/state").status_code == 404
+    assert game_module.get_game() is not None
+
+
+def test_idle_rooms_are_swept_without_new_rooms(client, monkeypatch):
+    def stop_sweep():
+        with game_module._rooms_lock:
+            if game_module._room_sweep is not None:
+                game_module._room_sweep.cancel()
+            game_module._room_sweep = None
+
+    stop_sweep()
+    monkeypatch.setattr(game_module, "ROOM_SWEEP_INTERVAL_S", 0.05)
+    try:
+        room = create_room(client)
+        game_module.get_game(room).last_active_at -= game_module.ROOM_IDLE_TIMEOUT_S + 1
+        deadline = time.time() + 2
+        while room in game_module._rooms:
+            assert time.time() < deadline, "idle room was not swept"
+            time.sleep(0.01)
+        assert game_module.get_game() is not None
+    finally:
+        stop_sweep()
+
+
+def test_busy_room_does_not_block_other_rooms(client):
+    room_a = create_room(client)
+    room_b = create_room(client)
+
+    with game_module.get_game(room_a).lock:
+        add_player(client, room_b, "Carol")
+        # Reads never take the room lock, even for the busy room.
+        r = client.get(f"/api/rooms/{room_a}/game/state")
+        assert r.status_code == 200
+
+    assert [p["name"] for p in client.get(f"/api/rooms/{room_b}/game/state").get_json()["players"]] == ["Carol"]
+
+
+def _received_events(sio_client) -> list[str]:
+    return [m["name"] for m in sio_client.get_received()]
+
+
+def test_broadcasts_reach_only_their_room_and_audience(app, client):
+    from server import socketio
+
+    room_a = create_room(client)
+    room_b = create_room(client)
+    main_a = socketio.test_client(app, query_string=f"room={room_a}&role=main")
+    main_b = socketio.test_client(app, query_string=f"room={room_b}&role=main")
+    phone_a = socketio.test_client(app, query_string=f"room={room_a}&role=player")
+    try:
+        for sio_client in (main_a, main_b, phone_a):
+            assert _received_events(sio_client) == ["game_state"]  # initial state on connect
+
+        alice = add_player(client, room_a, "Alice")
+        assert _received_events(main_a) == ["state_patch"]
+        assert _received_events(main_b) == []
+        assert _received_events(phone_a) == []  # not identified yet
+
+        phone_a.emit("identify", {"player_id": alice})
+        assert _received_events(phone_a) == ["game_state"]
+        add_player(client, room_a, "Bob")
+        assert _received_events(phone_a) == ["state_patch"]
+        assert _received_events(main_b) == []
+    finally:
+        for sio_client in (main_a, main_b, phone_a):
+            sio_client.disconnect()
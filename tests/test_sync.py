@@ -0,0 +1,153 @@
+"""
+Versioned state sync: full snapshot once, compact patches afterwards.
+
+Run with:  pytest tests/test_sync.py -v
+"""
+from __future__ import annotations
+
+import copy
+import time
+
+import pytest
+
+import server.game as game_module
+from server.sync import apply_patch, diff_state
+
+
+@pytest.fixture()
+def main_socket(app, client):
+    from server import socketio
+    sio_client = socketio.test_client(app, query_string="role=main")
+    yield sio_client
+    sio_client.disconnect()
+
+
+class ClientMirror:
+    """Applies game_state/state_patch messages the way the browser pages do."""
+
+    def __init__(self):
+        self.state = None
+        self.version = None
+        self.needs_resync = False
+
+    def feed(self, messages: list[dict]) -> None:
+        for message in messages:
+            payload = message["args"][0]
+            if message["name"] == "game_state":
+                self.state = payload
+                self.version = payload["version"]
+            elif message["name"] == "state_patch":
+                if payload["base_version"] != self.version:
+                    self.needs_resync = True
+                    continue
+                apply_patch(self.state, payload["ops"])
+                self.version = payload["version"]
+
+
+def wait_for_phase(client, phase: str, timeout: float = 2.0) -> None:
+    deadline = time.time() + timeout
+    while client.get("/api/game/state").get_json()["phase"] != phase:
+        assert time.time() < deadline, f"timed out waiting for {phase!r}"
+        time.sleep(0.01)
+
+
+def test_diff_and_apply_round_trip():
+    old = {
+        "phase": "voting",
+        "players": [{"name": "Alice", "score": 0}],
+        "current_turn": {"votes_received": 5, "answers": [{"id": "a"}, {"id": "b"}]},
+        "gone": True,
+    }
+    new = {
+        "phase": "voting",
+        "players": [{"name": "Alice", "score": 1000}, {"name": "Bob", "score": 0}],
+        "current_turn": {"votes_received": 6, "answers": [{"id": "a"}, {"id": "c"}]},
+        "added": None,
+    }
+
+    ops = diff_state(old, new)
+    assert {"op": "replace", "path": ["current_turn", "votes_received"], "value": 6} in ops
+    assert {"op": "replace", "path": ["current_turn", "answers", 1, "id"], "value": "c"} in ops
+    assert {"op": "remove", "path": ["gone"]} in ops
+    assert apply_patch(copy.deepcopy(old), ops) == new
+    assert diff_state(new, copy.deepcopy(new)) == []
+
+
+def test_vote_broadcasts_a_single_counter_patch(client, main_socket):
+    player_ids = [
+        client.post("/api/players", json={"name": name}).get_json()["player_id"]
+        for name in ["Alice", "Bob"]
+    ]
+    assert client.post("/api/game/start", json={}).status_code == 200
+    s = client.get("/api/game/state").get_json()
+    category_id = client.get("/api/categories").get_json()[0]["id"]
+    client.post("/api/game/category", json={"player_id": s["active_player_id"], "category_id": category_id})
+    for i, pid in enumerate(player_ids):
+        assert client.post("/api/game/lie", json={"player_id": pid, "text": f"Made-up answer {i}"}).status_code == 202
+    wait_for_phase(client, "voting")
+
+    mirror = ClientMirror()
+    mirror.feed(main_socket.get_received())
+
+    answers = client.get("/api/game/state").get_json()["current_turn"]["answers"]
+    vote_for = next(a for a in answers if a["author_id"] != player_ids[0])
+    assert client.post("/api/game/vote", json={"player_id": player_ids[0], "answer_id": vote_for["answer_id"]}).status_code == 200
+
+    patches = [m["args"][0] for m in main_socket.get_received() if m["name"] == "state_patch"]
+    assert len(patches) == 1
+    assert patches[0]["base_version"] == mirror.version
+    assert patches[0]["ops"] == [{"op": "replace", "path": ["current_turn", "votes_received"], "value": 1}]
+
+
+def test_patched_client_state_matches_server_state(client, main_socket):
+    mirror = ClientMirror()
+    for name in ["Alice", "Bob", "Carol"]:
+        client.post("/api/players", json={"name": name})
+        mirror.feed(main_socket.get_received())
+    client.patch(f"/api/players/{game_module.get_game().player_order[0]}", json={"name": "Alicia"})
+    client.post("/api/game/start", json={})
+    mirror.feed(main_socket.get_received())
+
+    assert not mirror.needs_resync
+    expected = client.get("/api/game/state").get_json()
+    assert {k: v for k, v in mirror.state.items() if k != "version"} == expected
+    assert [p["name"] for p in mirror.state["players"]] == ["Alicia", "Bob", "Carol"]
+
+
+def test_resync_returns_latest_full_state(client, main_socket):
+    client.post("/api/players", json={"name": "Alice"})
+    main_socket.get_received()
+
+    main_socket.emit("resync")
+    received = main_socket.get_received()
+    assert [m["name"] for m in received] == ["game_state"]
+    state = received[0]["args"][0]
+    assert state["version"] == game_module.get_game().state_version
+    assert [p["name"] for p in state["players"]] == ["Alice"]
+
+
+def test_state_version_stays_monotonic_across_reset(client):
+    game = game_module.get_game()
+    game.state_version = 41
+    assert game_module.reset_game().state_version == 41
+
+
+def test_sanitize_state_is_cached_until_the_next_mutation(client):
+    client.post("/api/players", json={"name": "Alice"})
+    game = game_module.get_game()
+
+    first = game_module.sanitize_state(game)
+    assert game_module.sanitize_state(game) is first
+    body = game_module.sanitized_state_json(game)
+    assert game_module.sanitized_state_json(game) is body
+    assert client.get("/api/game/state").get_data() == body
+
+    with game.lock:
+        game.players[game.player_order[0]].name = "Alicia"
+        # Mid-mutation reads are never served from (or stored in) the cache.
+        assert game_module.sanitize_state(game) is not first
+
+    updated = game_module.sanitize_state(game)
+    assert updated is not first
+    assert updated["players"][0]["name"] == "Alicia"
+    assert client.get("/api/game/state").get_json()["players"][0]["name"] == "Alicia"
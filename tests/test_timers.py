@@ -0,0 +1,104 @@
+"""
+Phase scheduler: one thread and a heap of deadlines for every room.
+
+Run with:  pytest tests/test_timers.py -v
+"""
+from __future__ import annotations
+
+import threading
+import time
+from unittest.mock import patch
+
+import server.game as game_module
+import server.timers as timers_module
+from server.timers import PhaseScheduler
+
+
+def _wait_until(predicate, timeout: float = 2.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition not met in time")
+
+
+def test_scheduler_fires_in_deadline_order():
+    scheduler = PhaseScheduler(workers=1)
+    fired: list[str] = []
+    scheduler.call_later(0.15, lambda: fired.append("late"))
+    scheduler.call_later(0.05, lambda: fired.append("early"))
+    scheduler.call_later(0.10, lambda: fired.append("middle"))
+
+    _wait_until(lambda: len(fired) == 3)
+    assert fired == ["early", "middle", "late"]
+
+
+def test_cancelled_timer_never_fires():
+    scheduler = PhaseScheduler()
+    fired = threading.Event()
+    handle = scheduler.call_later(0.05, fired.set)
+    handle.cancel()
+
+    time.sleep(0.15)
+    assert not fired.is_set()
+    assert scheduler.pending() == 0
+
+
+def test_many_pending_deadlines_share_one_thread():
+    scheduler = PhaseScheduler()
+    before = set(threading.enumerate())
+    handles = [scheduler.call_later(60 + i, lambda: None) for i in range(2000)]
+
+    assert scheduler.pending() == 2000
+    # One scheduler thread; workers are only spawned when a deadline fires.
+    assert len(set(threading.enumerate()) - before) == 1
+
+    for handle in handles:
+        handle.cancel()
+    assert scheduler.pending() == 0
+    assert len(scheduler._heap) < 2000  # cancelled entries get compacted
+
+
+def test_cancelling_a_fired_timer_leaves_the_pending_count_alone():
+    scheduler = PhaseScheduler()
+    fired = [scheduler.call_later(0, lambda: None) for _ in range(3)]
+    _wait_until(lambda: not scheduler._heap)
+    live = [scheduler.call_later(60 + i, lambda: None) for i in range(10)]
+
+    for handle in fired:
+        handle.cancel()
+    assert scheduler.pending() == 10
+    assert len(scheduler._heap) == 10
+
+    for handle in live:
+        handle.cancel()
+    assert scheduler.pending() == 0
+
+
+def test_reset_cancels_the_pending_phase_timer(app):
+    game_module.reset_game()
+    with app.test_client() as client, patch.object(timers_module, "PHASE_TIMEOUTS", {"category_pick": 60}):
+        for name in ["Alice", "Bob"]:
+            client.post("/api/players", json={"name": name})
+        assert client.post("/api/game/start", json={}).status_code == 200
+
+        handle = game_module.get_game().phase_timer
+        assert handle is not None and not handle.cancelled
+
+        client.post("/api/game/reset")
+        assert handle.cancelled
+    game_module.reset_game()
+
+
+def test_clock_sync_acks_with_server_time(app):
+    from server import socketio
+
+    sio_client = socketio.test_client(app, query_string="role=main")
+    try:
+        before = time.time()
+        ack = sio_client.emit("clock_sync", {"client_ts": 123.5}, callback=True)
+        assert ack["client_ts"] == 123.5
+        assert before <= ack["server_ts"] <= time.time()
+    finally:
+        sio_client.disconnect()